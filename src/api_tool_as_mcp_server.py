@@ -1,33 +1,59 @@
 # mcp_server.py
-import asyncio
-from fastapi import FastAPI
+import atexit
+import threading
+
 from mcp.server.fastmcp import FastMCP, Context
-from app import app as fastapi_app  # your FastAPI app
-from fastapi import testclient
 
 mcp = FastMCP("project-mcp")
 
+_client = None
+_client_lock = threading.Lock()  # the warm-up thread and the first tool call may both get here
+
+
+# FastAPI, the test client and app.py are imported after the MCP handshake, not before it:
+# every MCP client run spawns this server and waited for these imports before it could start
+def load_app():
+    from fastapi import testclient
+    from app import app as fastapi_app  # your FastAPI app
+
+    return testclient, fastapi_app
+
+
+def api_client():
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            testclient, fastapi_app = load_app()
+            client = testclient.TestClient(app=fastapi_app)
+            # entered, so app.py's lifespan runs: PROJECT_DATA_DIR persistence, the change feed's loop
+            client.__enter__()
+            atexit.register(client.__exit__, None, None, None)
+            _client = client
+    return _client
+
+
 @mcp.tool("get_project_data")
 async def get_project_data(ctx: Context, session_key: str) -> dict:
-    client = testclient.TestClient(app=fastapi_app)
-    resp = client.get("/get_project_data", params={"session_key": session_key})
+    resp = api_client().get("/get_project_data", params={"session_key": session_key})
     return resp.json()
 
 @mcp.tool("set_structure")
 async def set_structure(ctx: Context, session_key: str, name: str, fields: list[dict]) -> dict:
-    client = testclient.TestClient(app=fastapi_app)
     payload = {"session_key": session_key, "structure": {"name": name, "fields": fields}}
-    resp = client.post("/set_structure", json=payload)
+    resp = api_client().post("/set_structure", json=payload)
     return resp.json()
 
 @mcp.tool("set_message")
 async def set_message(ctx: Context, session_key: str, name: str, content: dict) -> dict:
-    client = testclient.TestClient(app=fastapi_app)
     payload = {"session_key": session_key, "message": {"name": name, "content": content}}
-    resp = client.post("/set_message", json=payload)
+    resp = api_client().post("/set_message", json=payload)
     return resp.json()
 
 
 if __name__ == "__main__":
+    # answer the handshake first; the app loads in the background while the client asks its model
+    threading.Thread(target=api_client, daemon=True).start()
     # don’t wrap with asyncio.run, just call run()
     mcp.run(transport="stdio")
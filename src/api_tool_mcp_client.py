@@ -1,21 +1,36 @@
 import asyncio
+import importlib
 import json
+import os
 import subprocess
+import threading
 from contextlib import AsyncExitStack
 from pathlib import Path
 from typing import Optional
 
-import ollama
-
+import metrics
+from model_router import ROUTER, ModelRouterError
 from mcp.client.stdio import stdio_client, StdioServerParameters
 from mcp.client.session import ClientSession
 
 
 CONFIG_FILE_NAME="api_tool_mcp_config.json"
-CONFIG_NAME="API_TOOL"
+CONFIG_NAME=os.environ.get("MCP_SERVER", "API_TOOL")  # "API_TOOL_WARM": fork from mcp_warm_server.py
+TOOL_MODE = os.environ.get("MCP_TOOL_MODE", "tools")
+MAX_TOOL_TURNS = 5
+FINISH_TOOL = "finish"
+SYSTEM_PROMPTS = {
+    "tools": "You operate a project API through the given tools. Call the tools the instruction needs, "
+             "then reply with a one-line summary.",
+    "format": "You operate a project API through tools. Answer with one tool call at a time; "
+              f"when the instruction is done, call \"{FINISH_TOOL}\" with a one-line summary.",
+}
 
 class OllamaMCPClient:
-    def __init__(self):
+    def __init__(self, tool_mode: str = TOOL_MODE):
+        # "tools": Ollama native tool calling, "format": JSON-schema constrained output,
+        # "prompt": tool list in the prompt + free-text JSON (models without either)
+        self.tool_mode = tool_mode
         # Initialize session and client objects
         self.session: Optional[ClientSession] = None
         self.exit_stack = AsyncExitStack()
@@ -38,6 +53,8 @@ class OllamaMCPClient:
 
         server_params = self.load_server_config(name=CONFIG_NAME)
         stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
+        # the server is starting now; import ollama (~250ms) meanwhile instead of before spawning it
+        threading.Thread(target=importlib.import_module, args=("ollama",), daemon=True).start()
         self.stdio, self.write = stdio_transport
         self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
 
@@ -58,14 +75,127 @@ class OllamaMCPClient:
         return json.loads(text[start:end+1])
 
     async def ask_ollama(self, user_prompt: str) -> str:
-        """Process a query using Claude and available tools"""
+        if self.tool_mode == "prompt":
+            return await self.ask_ollama_prompt(user_prompt)
+        return await self.ask_ollama_tools(user_prompt)
+
+    # ---------- native tool calling ----------
+
+    @staticmethod
+    def ollama_tools(tools) -> list:
+        """MCP tools -> Ollama's `tools` parameter (the MCP inputSchema already is a JSON schema)."""
+        return [
+            {"type": "function", "function": {"name": t.name, "description": t.description or "",
+                                              "parameters": t.inputSchema}}
+            for t in tools
+        ]
+
+    @staticmethod
+    def tool_call_schema(tools) -> dict:
+        """JSON schema for `format`: one {"tool", "arguments"} call of a listed tool, or finish."""
+        choices = [
+            {"type": "object", "properties": {"tool": {"const": t.name}, "arguments": t.inputSchema},
+             "required": ["tool", "arguments"]}
+            for t in tools
+        ]
+        choices.append({"type": "object", "properties": {
+            "tool": {"const": FINISH_TOOL},
+            "arguments": {"type": "object", "properties": {"summary": {"type": "string"}}, "required": ["summary"]},
+        }, "required": ["tool", "arguments"]})
+        return {"anyOf": choices}
+
+    @staticmethod
+    def check_format_call(content: str) -> dict:
+        """Format mode validator: the answer must be one {"tool": str, "arguments": {...}} call."""
+        call = json.loads(content)
+        if not isinstance(call, dict) or not isinstance(call.get("tool"), str) \
+                or not isinstance(call.get("arguments"), dict):
+            raise ValueError(f"not a tool call: {content[:200]}")
+        return call
+
+    def parse_tool_calls(self, message) -> tuple:
+        """-> ([(tool, arguments)], text); no calls means the model is done."""
+        if self.tool_mode == "format":
+            call = self.check_format_call(message.content)  # constrained by the schema, no brace hunting
+            if call["tool"] == FINISH_TOOL:
+                return [], call["arguments"].get("summary", "")
+            return [(call["tool"], call["arguments"])], ""
+        calls = [(c.function.name, dict(c.function.arguments)) for c in message.tool_calls or []]
+        return calls, message.content or ""
+
+    def tool_turn_messages(self, message, calls, results) -> list:
+        """The assistant turn and the tool results, as the next turn's input."""
+        if self.tool_mode == "format":
+            return [{"role": "assistant", "content": message.content}] + [
+                {"role": "user", "content": f"Tool {name} returned: {text}\nCall another tool or finish."}
+                for (name, _), text in zip(calls, results)
+            ]
+        assistant = {"role": "assistant", "content": message.content or "",
+                     "tool_calls": [{"function": {"name": name, "arguments": args}} for name, args in calls]}
+        return [assistant] + [{"role": "tool", "tool_name": name, "content": text}
+                              for (name, _), text in zip(calls, results)]
+
+    async def ask_ollama_tools(self, user_prompt: str, max_turns: int = MAX_TOOL_TURNS) -> str:
+        """Tools / format mode: schemas go in the request, not the prompt; loops until the model stops calling tools."""
+        import ollama  # usually already imported while the server started
+
+        response = await self.session.list_tools()
+        tools = response.tools
+        print("Available tools:", [t.name for t in tools])
+
+        with metrics.span("prompt_build"):
+            if self.tool_mode == "format":
+                chat_args = {"format": self.tool_call_schema(tools)}
+                validate = lambda r: self.check_format_call(r.message.content)
+            else:
+                chat_args = {"tools": self.ollama_tools(tools)}
+                validate = None
+            messages = [{"role": "system", "content": SYSTEM_PROMPTS[self.tool_mode]},
+                        {"role": "user", "content": user_prompt}]
+
+        last_result = None
+        for _ in range(max_turns):
+            sent = list(messages)
+            try:
+                with metrics.span("llm_generation"):
+                    ollama_response = await ROUTER.run_async(
+                        "tool_selection", sent, lambda model: ollama.chat(model=model, messages=sent, **chat_args),
+                        validate=validate, options={"mode": self.tool_mode, **chat_args})
+            except ModelRouterError as e:
+                # every model failed or (format mode) answered without a usable tool call
+                print("⚠️ No usable answer from any model:", e.__cause__ or e)
+                return f"Error: no usable answer from any model ({e.__cause__ or e})"
+            metrics.record_tokens(ollama_response.prompt_eval_count, ollama_response.eval_count)
+
+            calls, text = self.parse_tool_calls(ollama_response.message)
+            if not calls:
+                print("✅ Done:", text)
+                return f"OK: {last_result if last_result is not None else text}"
+
+            results = []
+            for tool, args in calls:
+                with metrics.span("api_call"):
+                    result = await self.session.call_tool(tool, args)
+                result_text = "\n".join(c.text for c in result.content if c.type == "text")
+                print("✅ Tool result:", result_text)
+                results.append(result_text)
+            last_result = results[-1]
+            messages += self.tool_turn_messages(ollama_response.message, calls, results)
+        return f"Error: still calling tools after {max_turns} turns"
+
+    # ---------- prompt mode ----------
+
+    async def ask_ollama_prompt(self, user_prompt: str) -> str:
+        """Prompt mode: tool list pasted into the prompt, free-text JSON answer (for models without tools / format)"""
+        import ollama
 
         response = await self.session.list_tools()
         tools = response.tools
         tools_schema = [t.__dict__ for t in tools]
         print("Available tools:", [t.name for t in tools])
 
-        system_prompt = f"""
+        with metrics.span("prompt_build"):
+            system_prompt = f"""
             You are an assistant that controls API tools.
 
             You have access to these tools:
@@ -81,13 +211,24 @@ class OllamaMCPClient:
               }}
             }}
             """
-        ollama_response = ollama.chat(
-            model="llama3",
-            messages=[{"role": "user", "content": system_prompt}],
-        )
+        messages = [{"role": "user", "content": system_prompt}]
+        with metrics.span("llm_generation"):
+            # the router picks a small model for tool selection and falls back on errors / non-JSON answers;
+            # awaited so the event loop (and the MCP session) keeps running meanwhile
+            try:
+                ollama_response = await ROUTER.run_async(
+                    "tool_selection", messages, lambda model: ollama.chat(model=model, messages=messages),
+                    validate=lambda r: self.extract_json(r.message.content)["tool"])
+            except ModelRouterError as e:
+                if e.output is None:
+                    print("⚠️ No answer from any model:", e.__cause__ or e)
+                    return f"Error: no answer from any model ({e.__cause__ or e})"
+                ollama_response = e.output  # reported by the JSON extraction below
+        metrics.record_tokens(ollama_response.prompt_eval_count, ollama_response.eval_count)
         ollama_response_content= ollama_response.message.content
         try:
-            tool_call = self.extract_json(ollama_response_content)
+            with metrics.span("json_extraction"):
+                tool_call = self.extract_json(ollama_response_content)
         except Exception as e:
             print("⚠️ Failed to parse JSON from LLM:", e)
             return "Error: Failed to parse JSON from LLM"
@@ -96,7 +237,8 @@ class OllamaMCPClient:
         args = tool_call["arguments"]
 
         # Call the tool
-        response = await self.session.call_tool(tool, args)
+        with metrics.span("api_call"):
+            response = await self.session.call_tool(tool, args)
         for content in response.content:
             if content.type == "text":
                 print("✅ Tool result:", content.text)
@@ -119,6 +261,7 @@ async def main():
                                               "username(string required), age(int), bio(string)")
     finally:
         await client.cleanup()
+        metrics.push()  # to the app's /_metrics when METRICS_PUSH_URL is set
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,11 +1,41 @@
 # app.py
-from fastapi import FastAPI, HTTPException, Body, Query
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Body, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field, model_validator
 from typing import Dict, List, Any, Optional
 from uuid import uuid4
 from datetime import datetime
 
-app = FastAPI(title="LLM-demo API (mock project service)")
+import metrics
+import persistence
+from change_feed import ChangeFeedHub, encode_data, sse_frame
+from columnar import StoredMessage, deep_sizeof
+from message_index import ProjectIndexes, parse_predicate, row_matches, structure_rows
+from serialization import JSONBytes, dumps
+from structure_versions import StructureHistory
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    CHANGE_FEED.bind_loop(asyncio.get_running_loop())
+    open_persistence()
+    yield
+    close_persistence()
+
+
+app = FastAPI(title="LLM-demo API (mock project service)", lifespan=lifespan)
+
+HTTP_REQUESTS = metrics.REGISTRY.counter(
+    "http_requests_total", "HTTP requests handled", ["method", "path", "status"])
+HTTP_LATENCY = metrics.REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "path"])
 
 # -----------------------------
 # Pydantic models (schemas)
@@ -44,12 +74,14 @@ class ProjectMessage(BaseModel):
     name: str = Field(..., min_length=1)
     created_at: datetime | None = None
     payload: list[Any]
+    # structure_name -> version the message was validated against (set by the server)
+    structure_versions: Optional[Dict[str, int]] = None
 
-    @model_validator(mode="before")
-    def ensure_timestamp(cls, values):
-        if "created_at" not in values or values.get("created_at") is None:
-            values["created_at"] = datetime.utcnow()
-        return values
+    @model_validator(mode="after")
+    def ensure_timestamp(self):
+        if self.created_at is None:
+            self.created_at = datetime.utcnow()
+        return self
 
 
 class SetMessageIn(BaseModel):
@@ -57,15 +89,204 @@ class SetMessageIn(BaseModel):
     message: ProjectMessage
 
 
+class QueryPredicate(BaseModel):
+    field: str = Field(..., min_length=1)
+    op: str = Field(..., pattern=r"^(==|!=|>|>=|<|<=)$")
+    value: Any = None
+
+
+class QueryMessagesIn(BaseModel):
+    session_key: str
+    structure_name: str = Field(..., min_length=1)
+    # "age > 30", "username == 'jane'" or {"field": "age", "op": ">", "value": 30}; all must hold on one row
+    where: List[str | QueryPredicate] = Field(default_factory=list)
+    limit: Optional[int] = Field(None, ge=1)
+
+
 # -----------------------------
 # In-memory storage
 # -----------------------------
 # sessions: session_key -> project_name
 SESSIONS: Dict[str, str] = {}
 
-# projects: project_name -> {"structures": {name: ProjectStructure}, "messages": {name: ProjectMessage}}
+# projects: project_name -> {"structures": {name: StructureHistory}, "messages": {name: StoredMessage},
+#                            "indexes": ProjectIndexes}
 PROJECTS: Dict[str, Dict[str, Dict[str, Any]]] = {}
 
+# REGISTRY_LOCK guards creating sessions and projects. Each project has its own lock for its
+# structures, messages and indexes, held for the short in-memory update + log append + feed
+# publish, so writes to different projects never wait on each other. Lock order: registry, then
+# projects by name; never take the registry lock while holding a project lock.
+# Handlers run on the event loop and take these with ``async with holding(lock)``: the loop never
+# blocks on one that a pool thread holds (a snapshot pausing all writes, a report copying a project).
+REGISTRY_LOCK = threading.Lock()
+PROJECT_LOCKS: Dict[str, threading.Lock] = {}
+
+
+def project_lock(project_name: str) -> threading.Lock:
+    return PROJECT_LOCKS[project_name]
+
+
+@asynccontextmanager
+async def holding(lock: threading.Lock):
+    """Hold a threading lock from the event loop; when it's taken, wait for it on an executor thread."""
+    if not lock.acquire(blocking=False):
+        acquired = asyncio.get_running_loop().run_in_executor(None, lock.acquire)
+        try:
+            await asyncio.shield(acquired)
+        except asyncio.CancelledError:
+            acquired.add_done_callback(lambda _: lock.release())  # the thread still gets it: give it back
+            raise
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+class AllWritesPaused:
+    """Blocks every writer while held; snapshots use it to take a consistent cut of the store."""
+
+    def __enter__(self):
+        REGISTRY_LOCK.acquire()
+        self._held = [PROJECT_LOCKS[name] for name in sorted(PROJECT_LOCKS)]
+        for lock in self._held:
+            lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        for lock in reversed(self._held):
+            lock.release()
+        REGISTRY_LOCK.release()
+
+
+# per-project deltas for /watch_project; published under the project lock so feed order == apply order
+# frames are only buffered while a project is watched (or was, in the last PROJECT_FEED_RETAIN_SECONDS)
+CHANGE_FEED = ChangeFeedHub(capacity=int(os.environ.get("PROJECT_FEED_BUFFER", "1024")),
+                            max_bytes=int(os.environ.get("PROJECT_FEED_BUFFER_BYTES", str(4 * 1024 * 1024))),
+                            retain_seconds=float(os.environ.get("PROJECT_FEED_RETAIN_SECONDS", "60")))
+WATCH_KEEPALIVE_SECONDS = 15.0
+
+
+# -----------------------------
+# Persistence (optional)
+# -----------------------------
+# set PROJECT_DATA_DIR to keep the store across restarts (write-ahead log + snapshots)
+DATA_DIR = os.environ.get("PROJECT_DATA_DIR")
+# "sync": answer after the group-commit fsync, "async": answer right after the in-memory update
+DURABILITY = os.environ.get("PROJECT_DURABILITY", "sync")
+SNAPSHOT_EVERY = int(os.environ.get("PROJECT_SNAPSHOT_EVERY", "100000"))
+
+PERSISTENCE: Optional[persistence.ProjectPersistence] = None
+
+
+def session_record(session_key: str, project_name: str) -> dict:
+    return {"op": "session", "session_key": session_key, "project": project_name}
+
+
+def structure_record(project_name: str, structure: ProjectStructure) -> dict:
+    return {"op": "set_structure", "project": project_name, "structure": structure.model_dump()}
+
+
+def message_record(project_name: str, message: ProjectMessage | StoredMessage) -> dict:
+    return {
+        "op": "set_message",
+        "project": project_name,
+        "message": {
+            "name": message.name,
+            "created_at": message.created_at.isoformat(),
+            "payload": message.payload,
+            "structure_versions": message.structure_versions,
+        },
+    }
+
+
+def apply_record(record: dict):
+    """Apply one snapshot / log record to the store (recovery path, input was validated when logged)."""
+    op = record["op"]
+    project_name = record["project"]
+    ensure_project_exists(project_name)
+    if op == "session":
+        SESSIONS[record["session_key"]] = project_name
+    elif op == "set_structure":
+        data = record["structure"]
+        structure = ProjectStructure.model_construct(
+            name=data["name"],
+            description=data.get("description"),
+            fields=[StructureField.model_construct(**f) for f in data["fields"]],
+        )
+        store_structure(project_name, structure)
+    elif op == "set_message":
+        data = record["message"]
+        store_message(project_name, data["name"], datetime.fromisoformat(data["created_at"]), data["payload"],
+                      data.get("structure_versions"))
+
+
+def dump_state():
+    # called with all writes paused: copy references now, encode lazily after the locks are released
+    sessions = list(SESSIONS.items())
+    projects = [
+        (name, [s for h in p["structures"].values() for s in h.versions()], list(p["messages"].values()))
+        for name, p in PROJECTS.items()
+    ]
+
+    def records():
+        for session_key, project_name in sessions:
+            yield session_record(session_key, project_name)
+        for project_name, structures, messages in projects:
+            yield {"op": "project", "project": project_name}
+            # every version, oldest first, so replay rebuilds the same history
+            for structure in structures:
+                yield structure_record(project_name, structure)
+            for message in messages:
+                yield message_record(project_name, message)
+
+    return records()
+
+
+def open_persistence():
+    global PERSISTENCE
+    if not DATA_DIR or PERSISTENCE is not None:
+        return
+    PERSISTENCE = persistence.ProjectPersistence(
+        DATA_DIR, dump_state=dump_state, apply=apply_record, pause_writes=AllWritesPaused(),
+        snapshot_every=SNAPSHOT_EVERY)
+    stats = PERSISTENCE.recover()
+    print(f"recovered project store from {DATA_DIR}: {stats}")
+
+
+def close_persistence():
+    global PERSISTENCE
+    if PERSISTENCE is not None:
+        PERSISTENCE.close()
+        PERSISTENCE = None
+
+
+def encode_mutation(make_record, *args) -> Optional[bytes]:
+    """Encode the log record up-front, before taking any lock (None when persistence is off)."""
+    if PERSISTENCE is None:
+        return None
+    return persistence.dumps(make_record(*args))
+
+
+def encode_message_mutation(project_name: str, message_json: bytes) -> Optional[bytes]:
+    """message_record() with the message already encoded by set_message."""
+    if PERSISTENCE is None:
+        return None
+    return b'{"op":"set_message","project":' + dumps(project_name) + b',"message":' + message_json + b"}"
+
+
+def log_mutation(entry: Optional[bytes]):
+    """Call under the project (or registry) lock right after the in-memory update."""
+    if entry is None or PERSISTENCE is None:
+        return None
+    return PERSISTENCE.append(entry)
+
+
+async def wait_durable(commit):
+    # awaited on the event loop, so writers waiting for a group commit don't hold pool threads
+    if commit is not None and DURABILITY == "sync":
+        await asyncio.wrap_future(commit)
+
 
 # -----------------------------
 # Helper utilities
@@ -79,39 +300,121 @@ def get_project_by_session(session_key: str) -> str:
 
 def ensure_project_exists(project_name: str):
     if project_name not in PROJECTS:
-        PROJECTS[project_name] = {"structures": {}, "messages": {}}
+        with REGISTRY_LOCK:
+            create_project(project_name)
+
+
+def create_project(project_name: str):
+    """Call with REGISTRY_LOCK held; no-op if the project exists."""
+    if project_name not in PROJECTS:
+        PROJECT_LOCKS[project_name] = threading.Lock()
+        PROJECTS[project_name] = {"structures": {}, "messages": {}, "indexes": ProjectIndexes()}
+
+
+def store_structure(project_name: str, structure: ProjectStructure) -> int:
+    """
+    Add structure as a new version of its name (copy-on-write), returns the version number.
+    Call with the project lock held.
+    """
+    structures = PROJECTS[project_name]["structures"]
+    history = structures.get(structure.name)
+    if history is None:
+        history = structures[structure.name] = StructureHistory(structure.name)
+    version = history.add(structure)
+    # indexes follow the latest version's meta {"index": true} declarations
+    messages = PROJECTS[project_name]["messages"]
+    PROJECTS[project_name]["indexes"].sync_structure(history.latest, ((n, m.payload) for n, m in messages.items()))
+    return version
+
+
+def structure_resolver(project_name: str):
+    structures = PROJECTS[project_name]["structures"]
+
+    def resolve(struct_name: str, version: int):
+        history = structures.get(struct_name)
+        return history.as_of(version) if history is not None else None
+
+    return resolve
+
+
+def store_message(project_name: str, name: str, created_at: datetime, payload: List[Any],
+                  structure_versions: Optional[Dict[str, int]]) -> StoredMessage:
+    """
+    Keep the message in compact form (payload rows of known structures are stored column-wise)
+    and update the project's field indexes from the incoming payload. Call with the project lock held.
+    """
+    stored = StoredMessage.from_payload(name, created_at, payload, structure_versions, structure_resolver(project_name))
+    PROJECTS[project_name]["indexes"].update_message(name, payload)
+    PROJECTS[project_name]["messages"][name] = stored
+    return stored
+
+
+def message_to_dict(m: ProjectMessage | StoredMessage) -> dict:
+    return {
+        "name": m.name,
+        "created_at": m.created_at.isoformat(),
+        "payload": m.payload,
+        "structure_versions": m.structure_versions,
+    }
 
 
 # Very small validation: ensure message content keys correspond to declared structure fields (if a structure used)
 # We'll allow messages that don't match any structure, but when a message refers to structure_name in payload we'll validate.
-def validate_message_against_structures(project_name: str, message: ProjectMessage):
+# Returns the structure versions the message was validated against, so it can pin them.
+def validate_message_against_structures(project_name: str, message: ProjectMessage) -> Dict[str, int]:
     # Optional: if message.payload contains a special key "__structure__" that names a structure, validate:
     payload = message.payload
+    pinned: Dict[str, int] = {}
     for item in payload:
         struct_name = item.get("structure_name")
         if struct_name:
             structs = PROJECTS[project_name]["structures"]
             if struct_name not in structs:
                 raise HTTPException(status_code=422, detail=f"Referenced structure '{struct_name}' not found in project")
+            pinned[struct_name] = structs[struct_name].latest_version
+    return pinned
+
+# -----------------------------
+# Instrumentation
+# -----------------------------
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # label by route template, not raw url, to keep label cardinality bounded
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        HTTP_LATENCY.observe(time.perf_counter() - started, method=request.method, path=path)
+        HTTP_REQUESTS.inc(method=request.method, path=path, status=str(status))
+
 
 # -----------------------------
 # Endpoints
 # -----------------------------
 @app.post("/get_session")
-def get_session(body: GetSessionIn):
+async def get_session(body: GetSessionIn):
     """
     Create a session for a project_name and return a session_key.
     If project does not exist yet, it is created (empty).
     """
     project_name = body.project_name
     session_key = str(uuid4())
-    SESSIONS[session_key] = project_name
-    ensure_project_exists(project_name)
+    entry = encode_mutation(session_record, session_key, project_name)
+    async with holding(REGISTRY_LOCK):
+        SESSIONS[session_key] = project_name
+        create_project(project_name)
+        commit = log_mutation(entry)
+    await wait_durable(commit)
     return {"session_key": session_key, "project_name": project_name}
 
 
 @app.get("/get_schema")
-def get_schema():
+async def get_schema():
     return {
         "set_structure": {
             "session_key": "string",
@@ -139,15 +442,21 @@ def get_schema():
         },
         "get_project_data": {
             "session_key": "string"
+        },
+        "query_messages": {
+            "session_key": "string",
+            "structure_name": "string",
+            "where": ["field == 'value'", "field > 10"]
         }
     }
 
 
 @app.post("/set_structure")
-def set_structure(body: SetStructureIn):
+async def set_structure(body: SetStructureIn):
     """
-    Add or replace a ProjectStructure for the project bound to session_key.
-    If a structure with the same name exists, it will be replaced.
+    Add a ProjectStructure for the project bound to session_key.
+    If a structure with the same name exists, this becomes its next version;
+    earlier versions stay available through /get_structure.
     """
     session_key = body.session_key
     try:
@@ -159,18 +468,25 @@ def set_structure(body: SetStructureIn):
     # Pydantic validation already applied when parsing SetStructureIn
 
     ensure_project_exists(project_name)
-    PROJECTS[project_name]["structures"][structure.name] = structure
-    return {"status": "ok", "project": project_name, "structure_added_or_replaced": structure.name}
+    entry = encode_mutation(structure_record, project_name, structure)
+    feed = CHANGE_FEED.feed(project_name)
+    delta = encode_data({"structure": structure.model_dump()}) if feed.buffering else None
+    async with holding(project_lock(project_name)):
+        version = store_structure(project_name, structure)
+        commit = log_mutation(entry)
+        feed.publish("set_structure", delta and delta[:-1] + b',"version":%d}' % version)
+    await wait_durable(commit)
+    return {"status": "ok", "project": project_name, "structure_added_or_replaced": structure.name,
+            "version": version}
 
 
 @app.post("/set_message")
-def set_message(body: SetMessageIn):
+async def set_message(body: SetMessageIn):
     """
     Add or replace a message for the project bound to session_key.
     If a message with the same name exists, it will be replaced.
     Basic validation against referenced structure (if present in payload).
     """
-    print("got_set_message")
     session_key = body.session_key
     try:
         project_name = get_project_by_session(session_key)
@@ -179,17 +495,28 @@ def set_message(body: SetMessageIn):
 
     message = body.message
     ensure_project_exists(project_name)
-    print("project_exsists")
 
     # run lightweight validation logic:
-    validate_message_against_structures(project_name, message)
-
-    PROJECTS[project_name]["messages"][message.name] = message
+    with metrics.span("validation"):
+        message.structure_versions = validate_message_against_structures(project_name, message) or None
+
+    # encode the message once, for both the change feed delta and the log record (if either wants it)
+    feed = CHANGE_FEED.feed(project_name)
+    entry = delta = None
+    if PERSISTENCE is not None or feed.buffering:
+        message_json = dumps(message_to_dict(message))
+        entry = encode_message_mutation(project_name, message_json)
+        delta = b'{"message":' + message_json + b"}" if feed.buffering else None
+    async with holding(project_lock(project_name)):
+        store_message(project_name, message.name, message.created_at, message.payload, message.structure_versions)
+        commit = log_mutation(entry)
+        feed.publish("set_message", delta)
+    await wait_durable(commit)
     return {"status": "ok", "project": project_name, "message_added_or_replaced": message.name}
 
 
-@app.get("/get_project_data")
-def get_project_data(session_key: str = Query(..., min_length=1)):
+@app.get("/get_project_data", response_class=JSONBytes)
+async def get_project_data(session_key: str = Query(..., min_length=1)):
     """
     Return all structures and messages for the project that corresponds to session_key.
     """
@@ -199,25 +526,162 @@ def get_project_data(session_key: str = Query(..., min_length=1)):
         raise
 
     ensure_project_exists(project_name)
-    structs = PROJECTS[project_name]["structures"]
-    msgs = PROJECTS[project_name]["messages"]
-
-    # convert models to dicts for JSON serialization
-    def model_to_dict(m):
-        if isinstance(m, ProjectStructure):
-            return m.dict()
-        if isinstance(m, ProjectMessage):
-            return {
-                "name": m.name,
-                "created_at": m.created_at.isoformat(),
-                "payload": m.payload
-            }
-        return m
+    # O(size of project): decoded and encoded on a pool thread, the event loop keeps serving other projects
+    return await run_in_threadpool(project_data_response, project_name)
+
+
+def project_data_response(project_name: str) -> JSONBytes:
+    with project_lock(project_name):
+        structs = [(name, h.latest, h.latest_version) for name, h in PROJECTS[project_name]["structures"].items()]
+        msgs = list(PROJECTS[project_name]["messages"].items())
+
+    # plain dicts of already validated data, encoded once to bytes by JSONBytes
+    return JSONBytes({
+        "project_name": project_name,
+        "structures": {name: {**latest.model_dump(), "version": version} for name, latest, version in structs},
+        "messages": {name: message_to_dict(m) for name, m in msgs},
+    })
 
+
+@app.post("/query_messages", response_class=JSONBytes)
+async def query_messages(body: QueryMessagesIn):
+    """
+    Return the messages that have a row of structure_name matching all predicates.
+    Predicates on fields declared with meta {"index": true} are answered from the index,
+    the rest are checked on the candidate messages (or on every message if none is indexed).
+    """
+    project_name = get_project_by_session(body.session_key)
+    ensure_project_exists(project_name)
+    try:
+        predicates = [parse_predicate(p) if isinstance(p, str) else (p.field, p.op, p.value) for p in body.where]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    # a scan is O(size of project): on a pool thread, like get_project_data
+    return await run_in_threadpool(query_response, project_name, body, predicates)
+
+
+def query_response(project_name: str, body: QueryMessagesIn, predicates) -> JSONBytes:
+    project = PROJECTS[project_name]
+    with project_lock(project_name):
+        candidates, used_indexes = project["indexes"].candidates(body.structure_name, predicates)
+        msgs = project["messages"]
+        if candidates is None:
+            selected = list(msgs.items())
+        else:
+            selected = [(name, msgs[name]) for name in sorted(candidates) if name in msgs]
+
+    matched = {}
+    for name, m in selected:
+        if any(row_matches(row, predicates) for row in structure_rows(m.payload, body.structure_name)):
+            matched[name] = message_to_dict(m)
+            if body.limit and len(matched) >= body.limit:
+                break
+    return JSONBytes({
+        "project_name": project_name,
+        "structure_name": body.structure_name,
+        "used_indexes": used_indexes,
+        "scanned": len(selected),
+        "count": len(matched),
+        "messages": matched,
+    })
+
+
+@app.get("/project_memory_report")
+def project_memory_report(session_key: str = Query(..., min_length=1)):
+    """
+    Approximate memory held by the project's messages in their stored (columnar) form,
+    next to what the same payloads take as plain dicts. O(size of project), meant for diagnostics.
+    """
+    project_name = get_project_by_session(session_key)
+    ensure_project_exists(project_name)
+    # runs on a pool thread (sync def): copy under the lock, measure without it
+    with project_lock(project_name):
+        msgs = list(PROJECTS[project_name]["messages"].values())
+
+    totals = {"messages": len(msgs), "columnar_items": 0, "raw_items": 0, "columnar_rows": 0}
+    for m in msgs:
+        for key, value in m.stats().items():
+            totals[key] += value
+    stored_payload_bytes = deep_sizeof([m.stored_items for m in msgs])
+    # decoded payloads must stay alive while measuring, deep_sizeof de-duplicates by id()
+    dict_payload_bytes = deep_sizeof([m.payload for m in msgs])
     return {
         "project_name": project_name,
-        "structures": {name: model_to_dict(s) for name, s in structs.items()},
-        "messages": {name: model_to_dict(m) for name, m in msgs.items()},
+        **totals,
+        "messages_bytes": deep_sizeof(msgs),
+        "change_feed_bytes": CHANGE_FEED.feed(project_name).buffered_bytes(),
+        "stored_payload_bytes": stored_payload_bytes,
+        "payload_as_dicts_bytes": dict_payload_bytes,
+        "payload_ratio": round(dict_payload_bytes / stored_payload_bytes, 2) if stored_payload_bytes else None,
+    }
+
+
+@app.get("/watch_project")
+async def watch_project(request: Request, session_key: str = Query(..., min_length=1), since: Optional[str] = None):
+    """
+    Server-Sent Events stream of the project's changes (set_structure / set_message deltas).
+    Resume with ?since=<last event id> (or the Last-Event-ID header); a "reset" event means
+    changes were missed and the client should re-read /get_project_data.
+    """
+    project_name = get_project_by_session(session_key)
+    feed = CHANGE_FEED.feed(project_name)
+    cursor, same_epoch = CHANGE_FEED.parse_cursor(since or request.headers.get("last-event-id"))
+
+    async def stream():
+        feed.attach()
+        try:
+            async for chunk in follow():
+                yield chunk
+        finally:
+            feed.detach()
+
+    async def follow():
+        nonlocal cursor
+        hello = {"project_name": project_name, "epoch": CHANGE_FEED.epoch, "seq": feed.last_seq}
+        yield sse_frame("hello", None, hello)
+        if cursor is None:
+            cursor = feed.last_seq  # live changes only
+        elif not same_epoch or cursor > feed.last_seq:
+            yield sse_frame("reset", None, {"reason": "server restarted", "seq": feed.last_seq})
+            cursor = feed.last_seq
+        while True:
+            events, missed = feed.read_after(cursor)
+            if missed:
+                yield sse_frame("reset", None, {"reason": "fell behind the change buffer", "seq": feed.last_seq})
+                cursor = events[-1][0] if events else feed.last_seq
+                continue
+            for seq, frame in events:
+                yield frame
+                cursor = seq
+            if await request.is_disconnected():
+                return
+            if not await feed.wait(cursor, WATCH_KEEPALIVE_SECONDS):
+                yield b": keepalive\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/get_structure")
+async def get_structure(session_key: str = Query(..., min_length=1), name: str = Query(..., min_length=1),
+                  version: Optional[int] = Query(None, ge=1)):
+    """
+    Return a structure as of a given version (latest if version is omitted),
+    e.g. the version a message pinned in its structure_versions.
+    """
+    project_name = get_project_by_session(session_key)
+    ensure_project_exists(project_name)
+    history = PROJECTS[project_name]["structures"].get(name)
+    if history is None:
+        raise HTTPException(status_code=404, detail=f"Structure '{name}' not found in project")
+    version = version or history.latest_version
+    structure = history.as_of(version)
+    if structure is None:
+        raise HTTPException(status_code=404, detail=f"Structure '{name}' has no version {version}")
+    return {
+        "project_name": project_name,
+        "version": version,
+        "latest_version": history.latest_version,
+        "structure": structure.model_dump(),
     }
 
 
@@ -225,5 +689,36 @@ def get_project_data(session_key: str = Query(..., min_length=1)):
 # Health and debug endpoints
 # -----------------------------
 @app.get("/_health")
-def health():
-    return {"status": "ok", "projects_count": len(PROJECTS), "sessions_count": len(SESSIONS)}
+async def health():
+    return {
+        "status": "ok",
+        "projects_count": len(PROJECTS),
+        "sessions_count": len(SESSIONS),
+        "persistence": PERSISTENCE is not None,
+    }
+
+
+@app.get("/_session_lookup")
+async def session_lookup(session_key: str):
+    """Project bound to a session on this process; used by shard_router.py to find a session's shard."""
+    return {"session_key": session_key, "project_name": get_project_by_session(session_key)}
+
+
+@app.post("/_snapshot")
+def snapshot():
+    """Force a compacted snapshot of the store (normally taken every PROJECT_SNAPSHOT_EVERY writes)."""
+    if PERSISTENCE is None:
+        raise HTTPException(status_code=409, detail="persistence is disabled (set PROJECT_DATA_DIR)")
+    return {"status": "ok", "snapshot_seq": PERSISTENCE.snapshot()}
+
+
+@app.get("/_metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition of request and pipeline-stage metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/_metrics/ingest")
+async def metrics_ingest(pushed: Dict[str, Dict[str, Any]] = Body(...)):
+    """Merge pipeline metrics pushed by the demos and the MCP client (metrics.push) into /_metrics."""
+    return {"status": "ok", "skipped": metrics.REGISTRY.ingest(pushed)}
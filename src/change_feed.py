@@ -0,0 +1,165 @@
+# change_feed.py
+"""
+Per-project change feed, served as Server-Sent Events by ``/watch_project``.
+
+Each mutation is published once: it gets the next per-project sequence number and is encoded to
+its SSE frame a single time, then appended to a bounded buffer shared by every watcher of the
+project. Watchers only hold a cursor into that buffer and all wait on one shared future that the
+publisher resolves, so a publish costs the same with 1 or 1000 watchers and nothing depends on
+how big the project is.
+
+Frames are only kept while the project has watchers, or had one in the last ``retain_seconds`` (so a
+reconnecting watcher can resume); otherwise a publish just advances the sequence number. The buffer
+holds at most ``capacity`` frames and ``max_bytes`` bytes.
+
+Event ids are ``<epoch>-<seq>``; ``epoch`` changes on every server start. A watcher resuming with
+an id from another epoch, or one that has fallen out of the buffer, gets a ``reset`` event and
+should re-read ``/get_project_data``.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+
+def encode_data(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def sse_frame(event: str, event_id: Optional[str], data: Dict[str, Any]) -> bytes:
+    head = f"event: {event}\n" + (f"id: {event_id}\n" if event_id is not None else "")
+    return head.encode("utf-8") + b"data: " + encode_data(data) + b"\n\n"
+
+
+class ProjectFeed:
+    def __init__(self, hub: "ChangeFeedHub", capacity: int, max_bytes: int, retain_seconds: float):
+        self.hub = hub
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.retain_seconds = retain_seconds
+        self._events: "deque[Tuple[int, bytes]]" = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.last_seq = 0
+        self.watchers = 0
+        self._last_watched = float("-inf")
+        self._next_change: Optional[asyncio.Future] = None  # only touched on the event loop
+
+    @property
+    def buffering(self) -> bool:
+        """Whether published frames are kept; callers may skip encoding a delta when not."""
+        return self.watchers > 0 or time.monotonic() - self._last_watched < self.retain_seconds
+
+    def attach(self):
+        with self._lock:
+            self.watchers += 1
+
+    def detach(self):
+        with self._lock:
+            self.watchers -= 1
+            self._last_watched = time.monotonic()
+
+    def publish(self, event: str, encoded: Optional[bytes]) -> int:
+        """
+        encoded: the event's JSON object from encode_data, prepared before taking any store lock
+        (None when the caller saw the feed was not buffering).
+        """
+        with self._lock:
+            self.last_seq += 1
+            seq = self.last_seq
+            if encoded is None or not self.buffering:
+                self._events.clear()  # nobody can resume from here anyway, free the frames
+                self._bytes = 0
+            else:
+                # splice the seq into the already encoded object: {"seq":N,...}
+                body = b'{"seq":%d' % seq + (b"," + encoded[1:] if encoded != b"{}" else b"}")
+                frame = b"event: %s\nid: %s-%d\ndata: %s\n\n" % (event.encode(), self.hub.epoch.encode(), seq, body)
+                self._events.append((seq, frame))
+                self._bytes += len(frame)
+                while len(self._events) > self.capacity or (self._bytes > self.max_bytes and len(self._events) > 1):
+                    self._bytes -= len(self._events.popleft()[1])
+        self.hub.wake(self)
+        return seq
+
+    def read_after(self, cursor: int) -> Tuple[List[Tuple[int, bytes]], bool]:
+        """Events with seq > cursor, and whether some were already dropped from the buffer."""
+        with self._lock:
+            if cursor >= self.last_seq:
+                return [], False
+            if not self._events or cursor < self._events[0][0] - 1:
+                return list(self._events), True
+            return list(islice(self._events, cursor - self._events[0][0] + 1, None)), False
+
+    def buffered_bytes(self) -> int:
+        return self._bytes
+
+    def _wake(self):
+        if self._next_change is not None and not self._next_change.done():
+            self._next_change.set_result(None)
+        self._next_change = None
+
+    async def wait(self, cursor: int, timeout: float) -> bool:
+        """Wait until something newer than cursor is published; False on timeout."""
+        if self.last_seq > cursor:
+            return True
+        if self._next_change is None:
+            self._next_change = asyncio.get_running_loop().create_future()
+        try:
+            # shield: one watcher timing out must not cancel the future the others wait on
+            await asyncio.wait_for(asyncio.shield(self._next_change), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class ChangeFeedHub:
+    """One fan-out feed per project; publish() may be called from any thread."""
+
+    def __init__(self, capacity: int = 1024, max_bytes: int = 4 * 1024 * 1024, retain_seconds: float = 60.0):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.retain_seconds = retain_seconds
+        self.epoch = uuid4().hex[:8]
+        self._feeds: Dict[str, ProjectFeed] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    def feed(self, project_name: str) -> ProjectFeed:
+        feed = self._feeds.get(project_name)
+        if feed is None:
+            with self._lock:
+                feed = self._feeds.setdefault(
+                    project_name, ProjectFeed(self, self.capacity, self.max_bytes, self.retain_seconds))
+        return feed
+
+    def publish(self, project_name: str, event: str, encoded: Optional[bytes]) -> int:
+        return self.feed(project_name).publish(event, encoded)
+
+    def wake(self, feed: ProjectFeed):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            feed._wake()
+        else:
+            loop.call_soon_threadsafe(feed._wake)
+
+    def parse_cursor(self, last_event_id: Optional[str]) -> Tuple[Optional[int], bool]:
+        """'<epoch>-<seq>' or '<seq>' -> (seq, same_epoch); (None, True) when not resuming."""
+        if not last_event_id:
+            return None, True
+        epoch, _, seq = last_event_id.rpartition("-")
+        if not seq.isdigit():
+            return None, False
+        return int(seq), epoch in ("", self.epoch)
@@ -0,0 +1,202 @@
+# columnar.py
+"""
+Compact, column-oriented storage for message payloads.
+
+A payload item that references a known structure, e.g.
+    {"structure_name": "user_profile", "type": "user_profile", "values": [{"username": "jane", "age": 34}, ...]}
+is stored as one column per ``StructureField`` instead of one dict per row:
+  - int / float / bool fields go into ``array.array`` columns (8 / 8 / 1 bytes per value)
+  - everything else goes into a plain list, with short strings interned so repeated values are shared
+  - a per-column ``bytearray`` mask is kept only when some rows omit the field
+
+Rows are rebuilt into dicts only when the message is read. Items that don't fit (unknown structure, only a few rows,
+keys outside the structure, non-dict rows, values of the wrong type for a typed column) fall back to a
+plain list column or are kept as-is, so reads always return what was written.
+"""
+import sys
+from array import array
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+INT_TYPES = {"int", "integer", "long"}
+FLOAT_TYPES = {"float", "double", "number", "decimal"}
+BOOL_TYPES = {"bool", "boolean"}
+
+INT64_MIN, INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+INTERN_MAX_LEN = 64
+# below this many rows the per-column containers cost more than the row dicts they replace
+MIN_COLUMNAR_ROWS = 4
+
+# column kind -> (array typecode, exact python type, filler for missing rows)
+TYPED_KINDS = {
+    "int": ("q", int, 0),
+    "float": ("d", float, 0.0),
+    "bool": ("b", bool, False),
+}
+
+
+def column_kind(field_type: str) -> str:
+    field_type = (field_type or "").lower()
+    if field_type in INT_TYPES:
+        return "int"
+    if field_type in FLOAT_TYPES:
+        return "float"
+    if field_type in BOOL_TYPES:
+        return "bool"
+    return "any"
+
+
+# layouts are per structure version; versions live forever in their history, so id() is stable
+_LAYOUTS: Dict[int, Tuple[Any, Tuple[Tuple[str, ...], Tuple[str, ...]]]] = {}
+
+
+def layout_for(structure) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    cached = _LAYOUTS.get(id(structure))
+    if cached is not None and cached[0] is structure:
+        return cached[1]
+    layout = (tuple(f.name for f in structure.fields), tuple(column_kind(f.type) for f in structure.fields))
+    _LAYOUTS[id(structure)] = (structure, layout)
+    return layout
+
+
+def _encode_column(kind: str, values: List[Any]):
+    typed = TYPED_KINDS.get(kind)
+    if typed is not None:
+        typecode, exact_type, _ = typed
+        # exact type check: a bool in an int column or an int in a float column must round-trip unchanged
+        if all(type(v) is exact_type for v in values):
+            if kind != "int" or all(INT64_MIN <= v <= INT64_MAX for v in values):
+                return array(typecode, values)
+    return [sys.intern(v) if type(v) is str and len(v) <= INTERN_MAX_LEN else v for v in values]
+
+
+class ColumnarItem:
+    """One payload item with its ``values`` rows stored column-wise."""
+
+    __slots__ = ("header", "names", "columns", "masks", "length")
+
+    def __init__(self, header: Dict[str, Any], names: Tuple[str, ...], columns: List[Any],
+                 masks: List[Optional[bytearray]], length: int):
+        self.header = header
+        self.names = names
+        self.columns = columns
+        self.masks = masks
+        self.length = length
+
+    @classmethod
+    def encode(cls, item: Any, structure) -> Optional["ColumnarItem"]:
+        if structure is None or not isinstance(item, dict):
+            return None
+        rows = item.get("values")
+        if not isinstance(rows, list) or len(rows) < MIN_COLUMNAR_ROWS or not all(type(r) is dict for r in rows):
+            return None
+        names, kinds = layout_for(structure)
+        known = set(names)
+        if any(key not in known for row in rows for key in row):
+            return None
+
+        columns: List[Any] = []
+        masks: List[Optional[bytearray]] = []
+        for name, kind in zip(names, kinds):
+            filler = TYPED_KINDS[kind][2] if kind in TYPED_KINDS else None
+            values = []
+            mask = None
+            for i, row in enumerate(rows):
+                if name in row:
+                    values.append(row[name])
+                else:
+                    if mask is None:
+                        mask = bytearray(b"\x01") * len(rows)
+                    mask[i] = 0
+                    values.append(filler)
+            columns.append(_encode_column(kind, values))
+            masks.append(mask)
+        header = {k: v for k, v in item.items() if k != "values"}
+        return cls(header, names, columns, masks, len(rows))
+
+    def decode(self) -> Dict[str, Any]:
+        rows: List[Dict[str, Any]] = [{} for _ in range(self.length)]
+        for name, column, mask in zip(self.names, self.columns, self.masks):
+            if type(column) is array and column.typecode == "b":
+                column = [bool(v) for v in column]  # array('b') hands back 0 / 1
+            if mask is None:
+                for row, value in zip(rows, column):
+                    row[name] = value
+            else:
+                for row, value, present in zip(rows, column, mask):
+                    if present:
+                        row[name] = value
+        return {**self.header, "values": rows}
+
+
+class StoredMessage:
+    """
+    How a message is kept in the store: slotted, payload items encoded column-wise where possible.
+    Exposes the same name / created_at / payload / structure_versions attributes as ProjectMessage.
+    """
+
+    __slots__ = ("name", "created_at", "structure_versions", "_items")
+
+    def __init__(self, name: str, created_at: datetime, items: List[Any],
+                 structure_versions: Optional[Dict[str, int]] = None):
+        self.name = name
+        self.created_at = created_at
+        self.structure_versions = structure_versions
+        self._items = items
+
+    @classmethod
+    def from_payload(cls, name: str, created_at: datetime, payload: Sequence[Any],
+                     structure_versions: Optional[Dict[str, int]],
+                     resolve_structure: Callable[[str, int], Any]) -> "StoredMessage":
+        """resolve_structure(structure_name, version) -> ProjectStructure or None"""
+        items = []
+        for item in payload:
+            encoded = None
+            if isinstance(item, dict) and structure_versions:
+                struct_name = item.get("structure_name")
+                version = structure_versions.get(struct_name) if struct_name else None
+                if version is not None:
+                    encoded = ColumnarItem.encode(item, resolve_structure(struct_name, version))
+            items.append(encoded if encoded is not None else item)
+        return cls(name, created_at, items, structure_versions)
+
+    @property
+    def stored_items(self) -> List[Any]:
+        """Payload items as held in memory (ColumnarItem or the original item)."""
+        return self._items
+
+    @property
+    def payload(self) -> List[Any]:
+        return [i.decode() if type(i) is ColumnarItem else i for i in self._items]
+
+    def stats(self) -> Dict[str, int]:
+        columnar = [i for i in self._items if type(i) is ColumnarItem]
+        return {
+            "columnar_items": len(columnar),
+            "raw_items": len(self._items) - len(columnar),
+            "columnar_rows": sum(i.length for i in columnar),
+        }
+
+
+# -----------------------------
+# Memory estimation
+# -----------------------------
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """Approximate retained size of obj; objects already in ``seen`` (shared/interned) count once."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += deep_sizeof(k, seen) + deep_sizeof(v, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for v in obj:
+            size += deep_sizeof(v, seen)
+    elif hasattr(obj, "__slots__") and not isinstance(obj, (str, bytes, bytearray, array)):
+        for slot in obj.__slots__:
+            if hasattr(obj, slot):
+                size += deep_sizeof(getattr(obj, slot), seen)
+    return size
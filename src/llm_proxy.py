@@ -0,0 +1,272 @@
+# llm_proxy.py
+"""
+One LLM queue for every process: an Ollama-compatible ``POST /api/chat`` in front of the real Ollama.
+
+llm_scheduler.SCHEDULER lives in one process, but the demos, every MCP client run and every warm
+MCP server child are separate processes. Pointed at this proxy they share one scheduler - the
+bounded queue, interactive-before-batch priorities, per-model limits with the interactive reserve,
+and coalescing of identical requests:
+
+    LLM_UPSTREAM=http://localhost:11434 python llm_proxy.py --port 11500
+    OLLAMA_HOST=http://localhost:11500 python api_tool_mcp_client.py      # the ollama package
+    OLLAMA_URL=http://localhost:11500/api/chat python xml_api_demo.py     # plain HTTP
+
+Requests are "interactive" unless they send ``X-LLM-Priority: batch``. Upstream is always streamed and
+every caller of a request gets the chunks as they arrive (coalesced callers included); a caller that
+asked for ``"stream": false`` gets them merged into one response. A full queue answers 503, like
+Ollama does with OLLAMA_MAX_QUEUE. Set LLM_MODEL_CONCURRENCY to what Ollama runs at once per model
+(OLLAMA_NUM_PARALLEL), otherwise requests just queue again inside Ollama.
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+import metrics
+from llm_scheduler import PRIORITIES, SCHEDULER, SCHEDULER_REQUESTS, LLMScheduler, QueueFull, prompt_key
+
+UPSTREAM = os.environ.get("LLM_UPSTREAM", "http://localhost:11434").rstrip("/")
+PRIORITY_HEADER = "x-llm-priority"
+
+
+# -----------------------------
+# Shared upstream streams
+# -----------------------------
+class _Stream:
+    """Chunks of one upstream generation, read by every caller that asked for it."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.status = 200
+        self.error: Optional[str] = None
+        self.waiters = 0
+        self.future = None  # the scheduler's Future of the generation
+        self._lock = threading.Lock()
+        self._wakeups: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    def push(self, chunk: Optional[bytes] = None, status: int = 200, error: Optional[str] = None):
+        """Append a chunk, or finish the stream (chunk None), possibly with an upstream error."""
+        with self._lock:
+            if chunk is not None:
+                self.chunks.append(chunk)
+            else:
+                self.done, self.status, self.error = True, status, error
+            wakeups, self._wakeups = self._wakeups, []
+        for loop, event in wakeups:
+            loop.call_soon_threadsafe(event.set)
+
+    async def _read(self, start: int) -> Tuple[List[bytes], bool]:
+        """Chunks from index start on, waiting for at least one unless the stream is done."""
+        while True:
+            event = asyncio.Event()
+            with self._lock:
+                chunks, done = self.chunks[start:], self.done
+                if not chunks and not done:
+                    self._wakeups.append((asyncio.get_running_loop(), event))
+            if chunks or done:
+                return chunks, done
+            await event.wait()
+
+    async def first(self):
+        await self._read(0)
+
+    async def iterate(self):
+        i = 0
+        while True:
+            chunks, done = await self._read(i)
+            for chunk in chunks:
+                yield chunk
+            i += len(chunks)
+            if done and not chunks:
+                return
+
+
+def merge_chunks(chunks: List[bytes]) -> Dict[str, Any]:
+    """NDJSON chat chunks -> the single response Ollama sends for "stream": false."""
+    content, tool_calls, final = [], [], {}
+    for line in chunks:
+        try:
+            chunk = json.loads(line)
+        except ValueError:
+            continue
+        message = chunk.get("message") or {}
+        content.append(message.get("content") or "")
+        tool_calls.extend(message.get("tool_calls") or ())
+        final = chunk
+    message = {"role": "assistant", "content": "".join(content)}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    return {**final, "message": message}
+
+
+class LLMProxy:
+    def __init__(self, upstream: str, scheduler: LLMScheduler):
+        self.upstream = upstream
+        self.scheduler = scheduler
+        self.http = httpx.Client(timeout=httpx.Timeout(30.0, read=None))
+        self._streams: Dict[str, _Stream] = {}  # identical requests in flight share one stream
+        self._lock = threading.Lock()
+
+    def join(self, body: Dict[str, Any], priority: str) -> _Stream:
+        """The stream answering body: an identical one in flight, or a newly scheduled one (may raise QueueFull)."""
+        model = body["model"]
+        options = {k: v for k, v in body.items() if k not in ("model", "messages", "stream", "keep_alive")}
+        key = prompt_key(model, body.get("messages") or [], **options)
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is None:
+                stream = _Stream(key)
+                # the stream itself is the scheduler key: coalescing happens here, where callers can
+                # join a generation that is already streaming
+                stream.future = self.scheduler.submit(model, stream, lambda: self._pump(stream, body), priority)
+                self._streams[key] = stream
+            else:
+                SCHEDULER_REQUESTS.inc(priority=priority, outcome="coalesced")
+                # an interactive caller joining queued batch work moves it up, as submit() would
+                self.scheduler.promote(stream.future, priority)
+            stream.waiters += 1
+        return stream
+
+    def leave(self, stream: _Stream):
+        """A caller is done with stream (finished or disconnected); unstarted work nobody waits for is dropped."""
+        with self._lock:
+            stream.waiters -= 1
+            if stream.waiters > 0 or stream.done:
+                return
+            if self.scheduler.cancel(stream.future):
+                self._streams.pop(stream.key, None)
+
+    def _pump(self, stream: _Stream, body: Dict[str, Any]):
+        """The scheduler job: stream the generation from upstream into stream."""
+        status, error = 200, None
+        try:
+            with self.http.stream("POST", f"{self.upstream}/api/chat", json={**body, "stream": True}) as resp:
+                if resp.status_code != 200:
+                    status, error = resp.status_code, resp.read().decode("utf-8", "replace")
+                else:
+                    for line in resp.iter_lines():
+                        if line:
+                            stream.push(line.encode("utf-8") + b"\n")
+        except httpx.HTTPError as e:
+            status, error = 502, f"upstream {self.upstream}: {e}"
+        except Exception as e:
+            status, error = 500, f"proxy: {e!r}"
+        finally:
+            with self._lock:
+                self._streams.pop(stream.key, None)
+            stream.push(None, status, error)
+
+
+async def until_disconnected(request: Request, awaitable, poll_seconds: float = 0.25):
+    """(result, False), or (None, True) when the client goes away first.
+
+    Starlette doesn't cancel a handler when its client disconnects, and a queued request may wait a long
+    time before its first chunk; without this check an abandoned request still takes a generation slot.
+    """
+    task = asyncio.ensure_future(awaitable)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=poll_seconds)
+        if done:
+            return task.result(), False
+        if await request.is_disconnected():
+            task.cancel()
+            return None, True
+
+
+PROXY = LLMProxy(UPSTREAM, SCHEDULER)
+app = FastAPI(title="LLM scheduling proxy (Ollama /api/chat)")
+
+
+# -----------------------------
+# Endpoints
+# -----------------------------
+async def _collect(stream: _Stream) -> List[bytes]:
+    return [chunk async for chunk in stream.iterate()]
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "body must be JSON"})
+    if not isinstance(body, dict) or not body.get("model"):
+        return JSONResponse(status_code=400, content={"error": "model is required"})
+    priority = request.headers.get(PRIORITY_HEADER, "interactive")
+    if priority not in PRIORITIES:
+        return JSONResponse(status_code=400, content={"error": f"{PRIORITY_HEADER} must be one of {list(PRIORITIES)}"})
+    try:
+        stream = PROXY.join(body, priority)
+    except QueueFull as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+
+    handed_off = False
+    try:
+        _, gone = await until_disconnected(request, stream.first())
+        if gone:
+            return Response(status_code=499)  # nobody reads it; leave() drops the job if it hasn't started
+        if stream.error is not None and not stream.chunks:
+            return JSONResponse(status_code=stream.status, content={"error": stream.error})
+        if body.get("stream", True) is False:
+            chunks, gone = await until_disconnected(request, _collect(stream))
+            if gone:
+                return Response(status_code=499)
+            if stream.error is not None:
+                return JSONResponse(status_code=stream.status, content={"error": stream.error})
+            return JSONResponse(merge_chunks(chunks))
+
+        async def relay():
+            try:
+                async for chunk in stream.iterate():
+                    yield chunk
+            finally:
+                PROXY.leave(stream)
+
+        handed_off = True
+        return StreamingResponse(relay(), media_type="application/x-ndjson")
+    finally:
+        if not handed_off:
+            PROXY.leave(stream)
+
+
+@app.get("/_health")
+def health():
+    return {"status": "ok", "upstream": PROXY.upstream, "scheduler": PROXY.scheduler.stats(),
+            "concurrency": PROXY.scheduler.concurrency, "interactive_reserved": PROXY.scheduler.interactive_reserved}
+
+
+@app.get("/_metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.api_route("/api/{path:path}", methods=["GET", "POST", "DELETE"])
+async def passthrough(path: str, request: Request):
+    """Everything else (/api/tags, /api/show, ...) goes straight to Ollama."""
+    async with httpx.AsyncClient(timeout=None) as client:
+        resp = await client.request(request.method, f"{PROXY.upstream}/api/{path}", content=await request.body(),
+                                    params=request.query_params,
+                                    headers={"content-type": request.headers.get("content-type", "application/json")})
+    return Response(content=resp.content, status_code=resp.status_code, media_type=resp.headers.get("content-type"))
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Shared LLM scheduling proxy for Ollama's /api/chat")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--upstream", default=None, help="Ollama base url (default LLM_UPSTREAM or http://localhost:11434)")
+    cli = parser.parse_args()
+    if cli.upstream:
+        PROXY.upstream = cli.upstream.rstrip("/")
+    print(f"scheduling {PROXY.upstream}/api/chat: concurrency {SCHEDULER.concurrency}, "
+          f"{SCHEDULER.interactive_reserved} slot(s) reserved for interactive, queue {SCHEDULER.max_queue}")
+    uvicorn.run(app, host="127.0.0.1", port=cli.port)
@@ -0,0 +1,260 @@
+# llm_scheduler.py
+"""
+Shared scheduler in front of the local Ollama, used by every LLM call in the demos.
+
+  - bounded queue    : at most LLM_MAX_QUEUE requests wait; more raise QueueFull right away
+                       instead of piling up behind a single model
+  - priorities       : "interactive" requests are started before queued "batch" ones
+  - per-model limits : LLM_MODEL_CONCURRENCY="llama3=4,default=2" generations per model at once;
+                       LLM_INTERACTIVE_RESERVED (1) of a model's slots are never given to batch work,
+                       so interactive latency stays flat under batch load (a model limited to one
+                       slot can't reserve it: batch work would never run)
+  - coalescing       : a request identical to one already queued or running (same model, messages
+                       and options) shares its result instead of generating again
+
+Callers keep their own transport and pass it in as ``generate`` (streaming, metrics, ...):
+    text = SCHEDULER.run("llama3", prompt_key("llama3", messages), lambda: call_ollama(...))
+    text = await SCHEDULER.run_async(...)   # from async code, doesn't block the event loop
+A ``timeout`` counts from when the generation starts, not from submit: time spent queued behind other
+work says nothing about the model. A caller that gives up (timeout, cancellation) leaves the queue;
+a request nobody waits for any more is dropped before it starts.
+
+The scheduler is per process; llm_proxy.py puts one in front of Ollama for all processes to share.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import metrics
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+SCHEDULER_REQUESTS = metrics.REGISTRY.counter(
+    "llm_scheduler_requests_total", "LLM requests seen by the scheduler", ["priority", "outcome"])
+
+
+class QueueFull(RuntimeError):
+    """The scheduler's queue is at LLM_MAX_QUEUE; retry later or shed the request."""
+
+
+def prompt_key(model: str, messages: List[Dict[str, Any]], **options) -> str:
+    """Coalescing key: identical model + messages + options generate once."""
+    return json.dumps([model, messages, options], sort_keys=True, separators=(",", ":"), default=str)
+
+
+def parse_concurrency(spec: str) -> Dict[str, int]:
+    """'llama3=2,mistral=1,default=1' -> {"llama3": 2, "mistral": 1, "default": 1}"""
+    limits = {}
+    for part in spec.split(","):
+        if part.strip():
+            model, _, limit = part.partition("=")
+            limits[model.strip()] = max(1, int(limit))
+    return limits
+
+
+class _Job:
+    __slots__ = ("model", "key", "generate", "priority", "future", "submitted", "started", "running", "waiters")
+
+    def __init__(self, model: str, key: Hashable, generate: Callable[[], Any], priority: int):
+        self.model = model
+        self.key = key
+        self.generate = generate
+        self.priority = priority
+        self.future: Future = Future()
+        self.submitted = time.perf_counter()
+        self.started = False  # taken off the queue (or dropped), under the scheduler lock
+        self.running: Future = Future()  # resolved when generate() starts, for timeouts
+        self.waiters = 1
+
+
+def _priority_name(level: int) -> str:
+    return next(name for name, value in PRIORITIES.items() if value == level)
+
+
+class LLMScheduler:
+    def __init__(self, max_queue: int = 64, concurrency: Optional[Dict[str, int]] = None,
+                 interactive_reserved: int = 1):
+        self.max_queue = max_queue
+        self.concurrency = concurrency or {"default": 2}
+        self.interactive_reserved = interactive_reserved
+        self._lock = threading.Lock()
+        # model -> heap of (priority, seq, job); stale entries (started / re-prioritised jobs) are skipped
+        self._queues: Dict[str, List[Tuple[int, int, _Job]]] = {}
+        self._running: Dict[str, List[int]] = {}  # model -> [interactive running, batch running]
+        self._inflight: Dict[Hashable, _Job] = {}
+        self._jobs: Dict[Future, _Job] = {}  # result future -> job, for cancel()
+        self._queued = 0
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> "LLMScheduler":
+        return cls(
+            max_queue=int(os.environ.get("LLM_MAX_QUEUE", "64")),
+            concurrency=parse_concurrency(os.environ.get("LLM_MODEL_CONCURRENCY", "default=2")),
+            interactive_reserved=int(os.environ.get("LLM_INTERACTIVE_RESERVED", "1")),
+        )
+
+    def limit(self, model: str) -> int:
+        return self.concurrency.get(model, self.concurrency.get("default", 2))
+
+    def submit(self, model: str, key: Hashable, generate: Callable[[], Any],
+               priority: str = "interactive") -> Future:
+        """Queue generate() (or join an identical in-flight request); the Future resolves to its result."""
+        level = PRIORITIES[priority]
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None:
+                SCHEDULER_REQUESTS.inc(priority=priority, outcome="coalesced")
+                job.waiters += 1
+                ready = self._raise_priority(job, level)  # an interactive caller now waits on it: move it up
+            else:
+                if self._queued >= self.max_queue:
+                    SCHEDULER_REQUESTS.inc(priority=priority, outcome="rejected")
+                    raise QueueFull(f"LLM queue is full ({self.max_queue} waiting)")
+                SCHEDULER_REQUESTS.inc(priority=priority, outcome="scheduled")
+                job = _Job(model, key, generate, level)
+                self._inflight[key] = job
+                self._jobs[job.future] = job
+                self._queued += 1
+                heapq.heappush(self._queues.setdefault(model, []), (level, next(self._seq), job))
+                ready = self._dispatch(model)
+        self._start(ready)
+        return job.future
+
+    def promote(self, future: Future, priority: str) -> bool:
+        """
+        Someone waiting for future needs it at priority: an unstarted job is moved up (never down).
+        For callers that coalesce on their own (llm_proxy.py joins streams that are already running).
+        """
+        with self._lock:
+            job = self._jobs.get(future)
+            if job is None or job.started or PRIORITIES[priority] >= job.priority:
+                return False
+            ready = self._raise_priority(job, PRIORITIES[priority])
+        self._start(ready)
+        return True
+
+    def run(self, model: str, key: Hashable, generate: Callable[[], Any], priority: str = "interactive",
+            timeout: Optional[float] = None) -> Any:
+        """Raises concurrent.futures.TimeoutError when generate() runs longer than timeout."""
+        future = self.submit(model, key, generate, priority)
+        try:
+            if timeout is not None:
+                self._running_future(future).result()
+            return future.result(timeout)
+        except BaseException:
+            self.cancel(future)
+            raise
+
+    async def run_async(self, model: str, key: Hashable, generate: Callable[[], Any],
+                        priority: str = "interactive", timeout: Optional[float] = None) -> Any:
+        """Raises asyncio.TimeoutError when generate() runs longer than timeout."""
+        future = self.submit(model, key, generate, priority)
+        try:
+            if timeout is not None:
+                await asyncio.shield(asyncio.wrap_future(self._running_future(future)))
+            # shield: the Future may be shared by coalesced callers, one of them timing out must not cancel it
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except BaseException:
+            self.cancel(future)
+            raise
+
+    def cancel(self, future: Future) -> bool:
+        """
+        The caller of submit() stops waiting for future. When no (coalesced) caller waits any more
+        and the job hasn't started, it is taken off the queue; True if so. A running generation
+        can't be interrupted and finishes on its own.
+        """
+        with self._lock:
+            job = self._jobs.get(future)
+            if job is None or job.future.done():
+                return False
+            job.waiters -= 1
+            if job.waiters > 0 or job.started:
+                return False
+            job.started = True  # its heap entry is skipped as stale from now on
+            self._queued -= 1
+            self._inflight.pop(job.key, None)
+            del self._jobs[future]
+        SCHEDULER_REQUESTS.inc(priority=_priority_name(job.priority), outcome="cancelled")
+        job.running.cancel()
+        future.cancel()
+        return True
+
+    def _running_future(self, future: Future) -> Future:
+        with self._lock:
+            job = self._jobs.get(future)
+        return job.running if job is not None else future
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queued": self._queued,
+                "running": {m: sum(r) for m, r in self._running.items()},
+                "inflight_keys": len(self._inflight),
+            }
+
+    # -----------------------------
+    # Dispatch
+    # -----------------------------
+    def _raise_priority(self, job: _Job, level: int) -> List[_Job]:
+        """Move an unstarted job up to level and pick what may start now; call with the lock held."""
+        if level >= job.priority or job.started:
+            return []
+        job.priority = level  # its old heap entry is now stale
+        heapq.heappush(self._queues[job.model], (level, next(self._seq), job))
+        # it may fit a slot its old priority couldn't take (the interactive reserve)
+        return self._dispatch(job.model)
+
+    def _dispatch(self, model: str) -> List[_Job]:
+        """Pick the jobs of model that may start now; call with the lock held."""
+        queue = self._queues.get(model)
+        running = self._running.setdefault(model, [0, 0])
+        limit = self.limit(model)
+        batch_limit = max(1, limit - self.interactive_reserved)
+        ready = []
+        while queue and sum(running) < limit:
+            level, _, job = queue[0]
+            if job.started or level != job.priority:
+                heapq.heappop(queue)  # stale entry
+                continue
+            if level == PRIORITIES["batch"] and running[1] >= batch_limit:
+                break  # the free slots are reserved for interactive requests
+            heapq.heappop(queue)
+            job.started = True
+            running[level] += 1
+            self._queued -= 1
+            ready.append(job)
+        return ready
+
+    def _start(self, jobs: List[_Job]):
+        for job in jobs:
+            threading.Thread(target=self._execute, args=(job,), daemon=True).start()
+
+    def _execute(self, job: _Job):
+        metrics.observe_stage("llm_queue_wait", time.perf_counter() - job.submitted)
+        job.running.set_result(None)
+        try:
+            result = job.generate()
+        except BaseException as e:
+            outcome = (job.future.set_exception, e)
+        else:
+            outcome = (job.future.set_result, result)
+        with self._lock:
+            self._running[job.model][job.priority] -= 1
+            self._inflight.pop(job.key, None)
+            self._jobs.pop(job.future, None)
+            ready = self._dispatch(job.model)
+        self._start(ready)
+        setter, value = outcome
+        setter(value)
+
+
+# shared by ollama_app_access, xml_api_demo and the MCP clients
+SCHEDULER = LLMScheduler.from_env()
@@ -0,0 +1,126 @@
+# mcp_warm_server.py
+"""
+Warm starts for api_tool_as_mcp_server.py (Unix only, optional).
+
+Every MCP client run spawns the server over stdio, and a cold server spends most of its startup
+importing mcp, FastAPI and app.py. A warm parent does those imports once and forks a child per client:
+
+    python mcp_warm_server.py serve                      # once, keeps running
+    MCP_SERVER=API_TOOL_WARM python api_tool_mcp_client.py
+
+The API_TOOL_WARM config entry runs "mcp_warm_server.py launch", which only imports os/socket/sys:
+it passes its stdin/stdout/stderr to the parent over a Unix socket (SCM_RIGHTS), the forked child
+serves MCP on them, and launch exits with the child's exit code. With no warm parent listening,
+launch execs the normal (cold) server, so the config entry always works.
+
+Each child gets its own copy of the (empty) in-memory store, like a cold server does. The parent only
+imports: the test client (and app.py's lifespan with it) starts in each child, since its threads
+would not survive the fork. Children share PROJECT_DATA_DIR if it is set, so leave it unset here.
+"""
+import os
+import socket
+import sys
+
+SOCKET_PATH = os.environ.get("MCP_WARM_SOCKET", "/tmp/api_tool_mcp_warm.sock")
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_tool_as_mcp_server.py")
+
+
+# -----------------------------
+# Client side: hand the stdio fds to the warm parent
+# -----------------------------
+def launch():
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(SOCKET_PATH)
+    except OSError:
+        os.execv(sys.executable, [sys.executable, SERVER_SCRIPT])  # no warm parent: cold start
+    socket.send_fds(sock, [b"run"], [0, 1, 2])
+    status = b""
+    while chunk := sock.recv(16):  # the child writes its exit code, then closes
+        status += chunk
+    sys.exit(int(status) if status.strip().lstrip(b"-").isdigit() else 1)
+
+
+# -----------------------------
+# Warm parent: import once, fork per connection
+# -----------------------------
+def serve():
+    import signal
+    import time
+
+    started = time.perf_counter()
+    import api_tool_as_mcp_server as server
+    server.load_app()  # FastAPI, app.py and the test client module, shared copy-on-write by the children
+    print(f"warm MCP server ready in {(time.perf_counter() - started) * 1000:.0f}ms on {SOCKET_PATH}",
+          file=sys.stderr)
+
+    if os.path.exists(SOCKET_PATH):
+        os.unlink(SOCKET_PATH)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(SOCKET_PATH)
+    listener.listen(16)
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # children are reaped automatically
+    try:
+        while True:
+            conn, _ = listener.accept()
+            try:
+                _, fds, _, _ = socket.recv_fds(conn, 16, 3)
+            except OSError:
+                conn.close()
+                continue
+            if len(fds) != 3:
+                for fd in fds:
+                    os.close(fd)
+                conn.close()
+                continue
+            sys.stdout.flush()
+            sys.stderr.flush()
+            if os.fork() == 0:
+                listener.close()
+                _run_child(server, conn, fds)  # never returns
+            for fd in fds:
+                os.close(fd)
+            conn.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        os.unlink(SOCKET_PATH)
+
+
+def _run_child(server, conn: socket.socket, fds):
+    import signal
+    import threading
+    import traceback
+
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    # new file objects: the parent's were opened on whatever it was started with (a tty, a log file)
+    sys.stdin = open(0, "r", encoding="utf-8", closefd=False)
+    sys.stdout = open(1, "w", encoding="utf-8", closefd=False)
+    sys.stderr = open(2, "w", encoding="utf-8", buffering=1, closefd=False)
+    code = 0
+    try:
+        threading.Thread(target=server.api_client, daemon=True).start()  # as the cold server does
+        server.mcp.run(transport="stdio")
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        try:
+            conn.sendall(str(code).encode())
+        except OSError:
+            pass  # launch is gone already
+        os._exit(code)
+
+
+if __name__ == "__main__":
+    commands = {"serve": serve, "launch": launch}
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        sys.exit(f"usage: {sys.argv[0]} serve|launch")
+    commands[sys.argv[1]]()
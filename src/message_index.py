@@ -0,0 +1,228 @@
+# message_index.py
+"""
+Opt-in secondary indexes over message values, used by ``/query_messages``.
+
+A field is indexed when its structure declares it in ``meta``:
+    {"name": "age", "type": "int", "meta": {"index": true}}
+
+Each ``FieldIndex`` maps the values found in ``values`` rows of that structure to message names:
+  - a hash map value -> names, for ``==``
+  - sorted (value, name) lists, one per comparable domain (numbers / strings / bools), for ``<  <=  >  >=``
+so lookups are O(1) / O(log n + matches) instead of a scan over every message.
+
+A message matches a query when one of its rows for the structure satisfies all predicates; the index
+only narrows the candidate messages, the rows of each candidate are still checked.
+"""
+import ast
+import operator
+import re
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+RANGE_OPS = {">", ">=", "<", "<="}
+
+PREDICATE_RE = re.compile(r"^\s*([A-Za-z_][\w.-]*)\s*(==|!=|>=|<=|>|<)\s*(.+?)\s*$")
+
+Predicate = Tuple[str, str, Any]
+
+
+def parse_predicate(expr: str) -> Predicate:
+    """'age > 30' -> ("age", ">", 30); "username == 'jane'" -> ("username", "==", "jane")."""
+    m = PREDICATE_RE.match(expr)
+    if m is None:
+        raise ValueError(f"cannot parse predicate {expr!r}, expected '<field> <op> <value>'")
+    field, op, raw = m.groups()
+    try:
+        value = ast.literal_eval(raw)
+    except (ValueError, SyntaxError):
+        value = raw  # bare words are strings: username == jane
+    return field, op, value
+
+
+def _domain(value: Any) -> Optional[str]:
+    """Values are only ordered against values of the same domain."""
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    return None
+
+
+def _hashable(value: Any) -> bool:
+    return isinstance(value, (str, int, float, bool)) or value is None
+
+
+def compare(value: Any, op: str, target: Any) -> bool:
+    if op in RANGE_OPS and (_domain(value) is None or _domain(value) != _domain(target)):
+        return False
+    if op in ("==", "!=") and _domain(value) != _domain(target) and not (value is None or target is None):
+        return op == "!="
+    return OPERATORS[op](value, target)
+
+
+def row_matches(row: Dict[str, Any], predicates: Iterable[Predicate]) -> bool:
+    for field, op, target in predicates:
+        if field not in row:
+            return False
+        if not compare(row[field], op, target):
+            return False
+    return True
+
+
+def structure_rows(payload: Iterable[Any], structure_name: str) -> Iterable[Dict[str, Any]]:
+    for item in payload:
+        if isinstance(item, dict) and item.get("structure_name") == structure_name:
+            for row in item.get("values") or ():
+                if isinstance(row, dict):
+                    yield row
+
+
+# -----------------------------
+# Indexes
+# -----------------------------
+class FieldIndex:
+    def __init__(self, structure_name: str, field: str):
+        self.structure_name = structure_name
+        self.field = field
+        self._equal: Dict[Tuple[Optional[str], Any], Set[str]] = {}
+        self._sorted: Dict[str, List[Tuple[Any, str]]] = {"number": [], "string": [], "bool": []}
+        self._by_message: Dict[str, List[Any]] = {}
+
+    def add(self, message_name: str, values: Iterable[Any]):
+        keys = []
+        for value in values:
+            if not _hashable(value):
+                continue
+            keys.append(value)
+            # (domain, value) so 1 and True don't share a bucket
+            self._equal.setdefault((_domain(value), value), set()).add(message_name)
+            domain = _domain(value)
+            if domain in self._sorted:
+                insort(self._sorted[domain], (value, message_name))
+        if keys:
+            self._by_message[message_name] = keys
+
+    def remove(self, message_name: str):
+        for value in self._by_message.pop(message_name, ()):
+            bucket = self._equal.get((_domain(value), value))
+            if bucket is not None:
+                bucket.discard(message_name)
+                if not bucket:
+                    del self._equal[(_domain(value), value)]
+            entries = self._sorted.get(_domain(value))
+            if entries is not None:
+                i = bisect_left(entries, (value, message_name))
+                if i < len(entries) and entries[i] == (value, message_name):
+                    entries.pop(i)
+
+    def lookup(self, op: str, target: Any) -> Optional[Set[str]]:
+        """Candidate message names, or None if this index can't answer op (caller scans)."""
+        if op == "==":
+            if not _hashable(target):
+                return None  # lists / dicts aren't indexed but still compare equal: scan
+            return set(self._equal.get((_domain(target), target), ()))
+        if op not in RANGE_OPS:
+            return None
+        entries = self._sorted.get(_domain(target))
+        if entries is None:
+            return set()
+        keys = _KeyView(entries)
+        if op == ">":
+            return {name for _, name in entries[bisect_right(keys, target):]}
+        if op == ">=":
+            return {name for _, name in entries[bisect_left(keys, target):]}
+        if op == "<":
+            return {name for _, name in entries[:bisect_left(keys, target)]}
+        return {name for _, name in entries[:bisect_right(keys, target)]}
+
+    def __len__(self):
+        return sum(len(v) for v in self._by_message.values())
+
+
+class _KeyView:
+    """Sequence view over the values of sorted (value, name) pairs, for bisect."""
+
+    __slots__ = ("entries",)
+
+    def __init__(self, entries: List[Tuple[Any, str]]):
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, i):
+        return self.entries[i][0]
+
+
+class ProjectIndexes:
+    """All field indexes of one project: structure_name -> field -> FieldIndex."""
+
+    def __init__(self):
+        self._indexes: Dict[str, Dict[str, FieldIndex]] = {}
+
+    @staticmethod
+    def declared_fields(structure) -> List[str]:
+        return [f.name for f in structure.fields if (f.meta or {}).get("index")]
+
+    def sync_structure(self, structure, messages: Iterable[Tuple[str, List[Any]]]):
+        """
+        Match the indexes of a structure to its (new) latest version: drop indexes that are no
+        longer declared and back-fill new ones from the existing (name, payload) messages.
+        """
+        declared = self.declared_fields(structure)
+        current = self._indexes.get(structure.name, {})
+        kept = {f: idx for f, idx in current.items() if f in declared}
+        added = [FieldIndex(structure.name, f) for f in declared if f not in kept]
+        if added:
+            for name, payload in messages:
+                rows = list(structure_rows(payload, structure.name))
+                if rows:
+                    for index in added:
+                        index.add(name, (row[index.field] for row in rows if index.field in row))
+        kept.update({index.field: index for index in added})
+        if kept:
+            self._indexes[structure.name] = kept
+        else:
+            self._indexes.pop(structure.name, None)
+
+    def update_message(self, name: str, payload: List[Any]):
+        for structure_name, indexes in self._indexes.items():
+            rows = list(structure_rows(payload, structure_name))
+            for index in indexes.values():
+                index.remove(name)
+                if rows:
+                    index.add(name, (row[index.field] for row in rows if index.field in row))
+
+    def indexed_fields(self, structure_name: str) -> List[str]:
+        return list(self._indexes.get(structure_name, {}))
+
+    def candidates(self, structure_name: str, predicates: List[Predicate]) -> Tuple[Optional[Set[str]], List[str]]:
+        """Intersect index lookups for the indexable predicates; (None, []) means a full scan is needed."""
+        indexes = self._indexes.get(structure_name, {})
+        result: Optional[Set[str]] = None
+        used = []
+        for field, op, target in predicates:
+            index = indexes.get(field)
+            if index is None:
+                continue
+            names = index.lookup(op, target)
+            if names is None:
+                continue
+            used.append(f"{field} {op}")
+            result = names if result is None else result & names
+            if not result:
+                break
+        return result, used
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {s: {f: len(idx) for f, idx in fields.items()} for s, fields in self._indexes.items()}
@@ -0,0 +1,375 @@
+# metrics.py
+"""
+Tiny Prometheus-style metrics (counters, gauges, histograms) and timing spans for the LLM-to-API pipeline.
+
+Stages timed with ``span(stage)`` end up in ``llm_pipeline_stage_seconds{stage="..."}``:
+  prompt_build, llm_time_to_first_token, llm_generation, json_extraction, normalization, api_call, validation
+
+``render()`` returns the text exposition format served by ``/_metrics`` in app.py.
+
+The demos and the MCP client are separate, short-lived processes: ``push()`` sends what changed since
+their last push to app.py's ``POST /_metrics/ingest``, which merges it into the app's registry, so the
+pipeline stages show up on the app's ``/_metrics`` next to its own request metrics.
+"""
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+PUSH_URL = os.environ.get("METRICS_PUSH_URL")  # e.g. http://127.0.0.1:8000/_metrics/ingest
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+METRIC_NAME_RE = re.compile(r"[a-zA-Z_:][a-zA-Z0-9_:]*")
+LABEL_NAME_RE = re.compile(r"[a-zA-Z_][a-zA-Z0-9_]*")
+
+
+def _check_names(name: str, labelnames: Tuple[str, ...], reserved: Tuple[str, ...] = ()):
+    """Names go into the exposition text verbatim; anything else could break or forge lines of it."""
+    if not isinstance(name, str) or not METRIC_NAME_RE.fullmatch(name):
+        raise ValueError(f"invalid metric name {name!r}")
+    for label in labelnames:
+        if not isinstance(label, str) or not LABEL_NAME_RE.fullmatch(label) or label.startswith("__") \
+                or label in reserved:
+            raise ValueError(f"{name}: invalid label name {label!r}")
+    if len(set(labelnames)) != len(labelnames):
+        raise ValueError(f"{name}: repeated label names {labelnames}")
+
+
+def _help_line(name: str, documentation: str) -> str:
+    escaped = str(documentation).replace("\\", "\\\\").replace("\n", "\\n")
+    return f"# HELP {name} {escaped}"
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _pushed_label_values(metric, key) -> LabelValues:
+    if not isinstance(key, list) or len(key) != len(metric.labelnames):
+        raise ValueError(f"{metric.name}: expected {len(metric.labelnames)} label values, got {key!r}")
+    return tuple(str(v) for v in key)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _check_names(name, self.labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels: str):
+        if amount < 0:
+            raise ValueError("counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            values = [[list(k), v] for k, v in sorted(self._values.items())]
+        return {"type": "counter", "documentation": self.documentation,
+                "labelnames": list(self.labelnames), "values": values}
+
+    def merge(self, values: List[list]):
+        """Add pushed increments (label values, amount); all of them, or none if one is invalid."""
+        rows = []
+        for key, amount in values:
+            if not _is_number(amount) or amount < 0:
+                raise ValueError(f"{self.name}: counter increments must be numbers >= 0, got {amount!r}")
+            rows.append((_pushed_label_values(self, key), amount))
+        with self._lock:
+            for key, amount in rows:
+                self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [_help_line(self.name, self.documentation), f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """A value that is set, not accumulated (moving averages, queue lengths)."""
+
+    def set(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), "type": "gauge"}
+
+    def merge(self, values: List[list]):
+        """Take pushed values (label values, value) as they are; all of them, or none if one is invalid."""
+        rows = []
+        for key, value in values:
+            if not _is_number(value):
+                raise ValueError(f"{self.name}: gauge values must be numbers, got {value!r}")
+            rows.append((_pushed_label_values(self, key), value))
+        with self._lock:
+            self._values.update(rows)
+
+    def collect(self) -> List[str]:
+        lines = super().collect()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _check_names(name, self.labelnames, reserved=("le",))
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> [per-bucket counts..., sum, count]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            row[-2] += value
+            row[-1] += 1
+
+    def count(self, **labels: str) -> int:
+        row = self._values.get(self._key(labels))
+        return int(row[-1]) if row else 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            values = [[list(k), list(v)] for k, v in sorted(self._values.items())]
+        return {"type": "histogram", "documentation": self.documentation, "labelnames": list(self.labelnames),
+                "buckets": list(self.buckets[:-1]), "values": values}
+
+    def merge(self, values: List[list]):
+        """Add pushed rows (label values, per-bucket counts + [sum, count]) observed with the same buckets;
+        all of them, or none if one is invalid."""
+        rows = []
+        for key, row in values:
+            if not isinstance(row, list) or len(row) != len(self.buckets) + 2:
+                raise ValueError(f"{self.name}: expected {len(self.buckets) + 2} fields per row, got {row!r}")
+            counts = row[:-2] + row[-1:]
+            if not all(_is_number(n) for n in row) or any(n < 0 for n in counts):
+                raise ValueError(f"{self.name}: bucket counts must be numbers >= 0, got {row!r}")
+            rows.append((_pushed_label_values(self, key), row))
+        with self._lock:
+            for key, row in rows:
+                mine = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+                for i, n in enumerate(row):
+                    mine[i] += n
+
+    def collect(self) -> List[str]:
+        lines = [_help_line(self.name, self.documentation), f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, row in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, row):
+                cumulative += n
+                le = ("le", _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(row[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {int(row[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def ingest(self, pushed: Dict[str, Dict[str, Any]]) -> List[str]:
+        """Merge a push() payload into this registry; returns the names that were skipped because they
+        are malformed or clash with a metric registered here under another type, labels or buckets.
+        A skipped metric changes nothing here."""
+        kinds = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}
+        skipped = []
+        for name, data in pushed.items():
+            try:
+                cls = kinds[data["type"]]
+                if not isinstance(data["labelnames"], list):
+                    raise ValueError(f"{name}: labelnames must be a list")
+                extra = {"buckets": [float(b) for b in data["buckets"]]} if cls is Histogram else {}
+                # a standalone copy validates names and every row before anything is registered
+                incoming = cls(name, str(data.get("documentation", name)), data["labelnames"], **extra)
+                incoming.merge(data["values"])
+                metric = self._register(incoming)
+                if metric is not incoming:
+                    if (type(metric) is not cls or metric.labelnames != incoming.labelnames
+                            or (extra and metric.buckets != incoming.buckets)):
+                        raise ValueError(f"{name} is registered differently here")
+                    metric.merge(data["values"])
+            except (KeyError, TypeError, ValueError):
+                skipped.append(name)
+        return skipped
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "llm_pipeline_stage_seconds", "Time spent in each stage of the LLM-to-API pipeline", ["stage"])
+TOKENS = REGISTRY.counter(
+    "llm_tokens_total", "Tokens reported by the model", ["kind"])
+
+
+# -----------------------------
+# Pipeline helpers
+# -----------------------------
+@contextmanager
+def span(stage: str):
+    """Time a pipeline stage into llm_pipeline_stage_seconds{stage=...}."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def record_tokens(prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+    if prompt_tokens:
+        TOKENS.inc(prompt_tokens, kind="prompt")
+    if completion_tokens:
+        TOKENS.inc(completion_tokens, kind="completion")
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# -----------------------------
+# Pushing to the app
+# -----------------------------
+_pushed: Dict[Tuple[str, LabelValues], Any] = {}  # what the last successful push reported, per series
+_push_lock = threading.Lock()
+
+
+def _changes(snapshot: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Counters and histograms as increments since the last push, gauges as their current value."""
+    payload = {}
+    for name, data in snapshot.items():
+        values = []
+        for key, value in data["values"]:
+            last = _pushed.get((name, tuple(key)))
+            if data["type"] == "histogram":
+                delta = [a - b for a, b in zip(value, last)] if last else value
+                changed = delta[-1] > 0
+            elif data["type"] == "gauge":
+                delta, changed = value, value != last
+            else:
+                delta = value - (last or 0)
+                changed = delta > 0
+            if changed:
+                values.append([key, delta])
+        if values:
+            payload[name] = {**data, "values": values}
+    return payload
+
+
+def push(url: Optional[str] = None, timeout: float = 2.0) -> bool:
+    """Send what changed since the last push to url (default METRICS_PUSH_URL), an app's /_metrics/ingest.
+
+    Returns False when there is nowhere to push or the app can't be reached; the changes are then
+    kept for the next push.
+    """
+    url = url or PUSH_URL
+    if not url:
+        return False
+    import urllib.request  # only processes that push pay for it
+
+    with _push_lock:
+        snapshot = REGISTRY.snapshot()
+        payload = _changes(snapshot)
+        if payload:
+            request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"), method="POST",
+                                             headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as resp:
+                    resp.read()
+            except OSError:
+                return False
+        for name, data in snapshot.items():
+            for key, value in data["values"]:
+                _pushed[(name, tuple(key))] = value
+    return True
@@ -0,0 +1,309 @@
+# mock_ollama_server.py
+"""
+Local stand-in for the Ollama HTTP API, used to benchmark the LLM pipeline offline.
+
+It implements ``POST /api/chat`` (NDJSON streaming and ``"stream": false``) and
+replays recorded completions (e.g. the committed ``*.xml`` outputs) chosen by
+matching a substring of the last user message.
+When the request carries ``tools`` and the recording is a ``{"tool": ..., "arguments": ...}`` object,
+it is answered as a native tool call; a request ending with a tool result gets ``tool_followup_response``.
+
+Timing and failures are configurable so runs are reproducible:
+  - time_to_first_token_ms : delay before the first chunk
+  - tokens_per_second      : pacing of the following chunks (0 = as fast as possible)
+  - failure_rate           : fraction of requests that fail (seeded, deterministic order)
+  - failure_mode           : "http_500" (reject up-front) or "drop_stream" (cut mid-stream;
+                             a "stream": false answer is cut halfway through its JSON body)
+  - num_parallel           : generations served at once, later requests wait (like OLLAMA_NUM_PARALLEL, 0 = no limit)
+
+Run it in place of a real Ollama:
+    uvicorn mock_ollama_server:app --port 11434
+or  python mock_ollama_server.py --port 11434 --config mock_ollama_config.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+
+DEFAULT_CONFIG_PATH = Path(__file__).with_name("mock_ollama_config.json")
+CONFIG_ENV_VAR = "MOCK_OLLAMA_CONFIG"
+
+# a "token" is a word together with its trailing whitespace - close enough for pacing
+TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+app = FastAPI(title="Mock Ollama server (offline benchmarking)")
+
+
+# -----------------------------
+# Configuration
+# -----------------------------
+class MockConfig(BaseModel):
+    time_to_first_token_ms: float = 0.0
+    tokens_per_second: float = 0.0
+    failure_rate: float = 0.0
+    failure_mode: str = "http_500"  # "http_500" | "drop_stream"
+    num_parallel: int = 0
+    seed: int = 0
+    default_response: str = "{}"
+    tool_followup_response: str = "Done."
+    # [{"match": "substring", "content": "..."} | {"match": "substring", "file": "path"}]
+    recordings: List[Dict[str, str]] = []
+
+
+class ConfigUpdateIn(BaseModel):
+    time_to_first_token_ms: Optional[float] = None
+    tokens_per_second: Optional[float] = None
+    failure_rate: Optional[float] = None
+    failure_mode: Optional[str] = None
+    num_parallel: Optional[int] = None
+    seed: Optional[int] = None
+
+
+class MockState:
+    """Active config, loaded recordings and the seeded failure sequence."""
+
+    def __init__(self, config: MockConfig, base_dir: Path):
+        self.lock = threading.Lock()
+        self.base_dir = base_dir
+        self.requests_served = 0
+        self.failures_injected = 0
+        self.apply(config)
+
+    def apply(self, config: MockConfig):
+        with self.lock:
+            self.config = config
+            self.rng = random.Random(config.seed)
+            self.slots = asyncio.Semaphore(config.num_parallel) if config.num_parallel > 0 else None
+            self.recordings = [(r["match"].lower(), self._load_recording(r)) for r in config.recordings]
+
+    def _load_recording(self, recording: Dict[str, str]) -> str:
+        if "content" in recording:
+            return recording["content"]
+        path = Path(recording["file"])
+        if not path.is_absolute():
+            path = self.base_dir / path
+        return path.read_text()
+
+    def pick_completion(self, prompt: str) -> str:
+        lowered = prompt.lower()
+        for match, content in self.recordings:
+            if match in lowered:
+                return content
+        return self.config.default_response
+
+    def should_fail(self) -> bool:
+        # one draw per request, so a given seed always fails the same request numbers
+        with self.lock:
+            self.requests_served += 1
+            failed = self.rng.random() < self.config.failure_rate
+            if failed:
+                self.failures_injected += 1
+            return failed
+
+
+def load_config(path: Optional[str] = None) -> MockConfig:
+    path = path or os.environ.get(CONFIG_ENV_VAR) or str(DEFAULT_CONFIG_PATH)
+    if not Path(path).exists():
+        return MockConfig()
+    return MockConfig(**json.loads(Path(path).read_text()))
+
+
+def _config_base_dir(path: Optional[str] = None) -> Path:
+    path = path or os.environ.get(CONFIG_ENV_VAR) or str(DEFAULT_CONFIG_PATH)
+    return Path(path).resolve().parent
+
+
+STATE = MockState(load_config(), _config_base_dir())
+
+
+# -----------------------------
+# Ollama wire format helpers
+# -----------------------------
+class ChatIn(BaseModel):
+    model: str
+    messages: List[Dict[str, Any]] = []
+    stream: bool = True  # Ollama streams unless told otherwise
+    format: Optional[Any] = None
+    options: Optional[Dict[str, Any]] = None
+    tools: Optional[List[Dict[str, Any]]] = None
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _last_user_content(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return str(message.get("content") or "")
+    return ""
+
+
+def _as_tool_calls(completion: str) -> Optional[List[Dict[str, Any]]]:
+    try:
+        call = json.loads(completion)
+    except ValueError:
+        return None
+    if not isinstance(call, dict) or "tool" not in call or "arguments" not in call:
+        return None
+    return [{"function": {"name": call["tool"], "arguments": call["arguments"]}}]
+
+
+def _chunk(model: str, content: str, tool_calls: Optional[List[Dict[str, Any]]] = None) -> bytes:
+    body = {
+        "model": model,
+        "created_at": _now_iso(),
+        "message": {"role": "assistant", "content": content},
+        "done": False,
+    }
+    if tool_calls:
+        body["message"]["tool_calls"] = tool_calls
+    return (json.dumps(body) + "\n").encode("utf-8")
+
+
+def _final(model: str, content: str, prompt_tokens: int, eval_tokens: int, started: float, first_token: float) -> Dict[str, Any]:
+    now = time.perf_counter()
+    return {
+        "model": model,
+        "created_at": _now_iso(),
+        "message": {"role": "assistant", "content": content},
+        "done": True,
+        "done_reason": "stop",
+        "total_duration": int((now - started) * 1e9),
+        "load_duration": 0,
+        "prompt_eval_count": prompt_tokens,
+        "prompt_eval_duration": int((first_token - started) * 1e9),
+        "eval_count": eval_tokens,
+        "eval_duration": int((now - first_token) * 1e9),
+    }
+
+
+@asynccontextmanager
+async def _generation_slot():
+    slots = STATE.slots
+    if slots is None:
+        yield
+        return
+    async with slots:
+        yield
+
+
+async def _sleep_until(deadline: float):
+    delay = deadline - time.perf_counter()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+# -----------------------------
+# Endpoints
+# -----------------------------
+@app.post("/api/chat")
+async def chat(body: ChatIn):
+    config = STATE.config
+    prompt = _last_user_content(body.messages)
+    if body.messages and body.messages[-1].get("role") == "tool":
+        completion = config.tool_followup_response
+    else:
+        completion = STATE.pick_completion(prompt)
+    # paced by the completion's length either way, but sent as one tool_calls message
+    tool_calls = _as_tool_calls(completion) if body.tools else None
+    tokens = TOKEN_RE.findall(completion)
+    prompt_tokens = len(TOKEN_RE.findall(prompt))
+    failed = STATE.should_fail()
+
+    if failed and config.failure_mode == "http_500":
+        return JSONResponse(status_code=500, content={"error": "mock ollama: injected failure"})
+
+    per_token = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+
+    if not body.stream:
+        # same pacing, delivered as a single response; a dropped one ends halfway, like the stream does
+        generated = len(tokens) // 2 if failed else len(tokens)
+        async with _generation_slot():
+            started = time.perf_counter()
+            first_token_at = started + config.time_to_first_token_ms / 1000.0
+            await _sleep_until(first_token_at + per_token * max(generated - 1, 0))
+        final = _final(body.model, "" if tool_calls else completion, prompt_tokens, len(tokens), started, first_token_at)
+        if tool_calls:
+            final["message"]["tool_calls"] = tool_calls
+        if failed:
+            encoded = json.dumps(final).encode("utf-8")
+            return Response(content=encoded[:len(encoded) // 2], media_type="application/json")
+        return final
+
+    async def stream():
+        # a dropped stream stops halfway through without the final "done" chunk
+        cut_at = len(tokens) // 2 if failed else len(tokens)
+        async with _generation_slot():
+            started = time.perf_counter()
+            first_token_at = started + config.time_to_first_token_ms / 1000.0
+            for i, token in enumerate(tokens[:cut_at]):
+                await _sleep_until(first_token_at + per_token * i)
+                if not tool_calls:
+                    yield _chunk(body.model, token)
+            if tool_calls and not failed:
+                yield _chunk(body.model, "", tool_calls)
+        if failed:
+            return
+        final = _final(body.model, "", prompt_tokens, len(tokens), started, first_token_at)
+        yield (json.dumps(final) + "\n").encode("utf-8")
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get("/_mock/config")
+def get_mock_config():
+    return STATE.config.model_dump(exclude={"recordings"})
+
+
+@app.post("/_mock/config")
+def update_mock_config(body: ConfigUpdateIn):
+    """Change timing / failure settings between benchmark runs without restarting."""
+    updates = body.model_dump(exclude_none=True)
+    if "failure_mode" in updates and updates["failure_mode"] not in ("http_500", "drop_stream"):
+        raise HTTPException(status_code=422, detail="failure_mode must be 'http_500' or 'drop_stream'")
+    STATE.apply(STATE.config.model_copy(update=updates))
+    return get_mock_config()
+
+
+@app.get("/_health")
+def health():
+    return {
+        "status": "ok",
+        "recordings_count": len(STATE.recordings),
+        "requests_served": STATE.requests_served,
+        "failures_injected": STATE.failures_injected,
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Mock Ollama server")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--config", default=None, help="path to a mock_ollama_config.json")
+    parser.add_argument("--ttft-ms", type=float, default=None, help="override time_to_first_token_ms")
+    parser.add_argument("--tps", type=float, default=None, help="override tokens_per_second")
+    parser.add_argument("--failure-rate", type=float, default=None)
+    parser.add_argument("--num-parallel", type=int, default=None, help="override num_parallel")
+    cli = parser.parse_args()
+
+    config = load_config(cli.config)
+    overrides = {"time_to_first_token_ms": cli.ttft_ms, "tokens_per_second": cli.tps, "failure_rate": cli.failure_rate,
+                 "num_parallel": cli.num_parallel}
+    config = config.model_copy(update={k: v for k, v in overrides.items() if v is not None})
+    STATE.base_dir = _config_base_dir(cli.config)
+    STATE.apply(config)
+    uvicorn.run(app, host="127.0.0.1", port=cli.port)
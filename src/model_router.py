@@ -0,0 +1,242 @@
+# model_router.py
+"""
+Picks the model for each LLM call instead of a hardcoded "llama3".
+
+model_router_config.json (or MODEL_ROUTER_CONFIG) lists, per task, candidate models from cheapest
+to most capable, and per model the longest prompt it should get:
+    "tasks":  {"tool_selection": {"models": ["llama3.2:3b", "llama3"], "timeout_seconds": 60}, ...}
+    "models": {"llama3.2:3b": {"max_prompt_chars": 8000}, ...}
+
+A call goes to the first candidate that fits the prompt and is healthy, and falls back to the next
+one when the model raises, generates past the task's timeout_seconds, or returns output the caller's
+validator rejects. Generation latency and success rate are tracked per (task, model) as moving
+averages (exported as llm_router_latency_seconds / llm_router_success_rate): a model whose success
+rate drops below min_success_rate goes last, one slower on average than the task's
+latency_budget_seconds goes after the ones within budget - each for retry_after_seconds after its
+last call, then it's tried in config order again to refresh its averages.
+
+Calls go through llm_scheduler.SCHEDULER, so queueing / coalescing apply per chosen model:
+    text = ROUTER.run("xml_edit", messages, lambda model: stream_chat(model, messages), validate=check_xml)
+"""
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+from llm_scheduler import SCHEDULER, QueueFull, prompt_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = Path(__file__).with_name("model_router_config.json")
+CONFIG_ENV_VAR = "MODEL_ROUTER_CONFIG"
+
+ROUTER_CALLS = metrics.REGISTRY.counter(
+    "llm_router_calls_total", "LLM calls per task, model and outcome", ["task", "model", "outcome"])
+ROUTER_LATENCY = metrics.REGISTRY.gauge(
+    "llm_router_latency_seconds", "Moving average generation latency per task and model", ["task", "model"])
+ROUTER_SUCCESS_RATE = metrics.REGISTRY.gauge(
+    "llm_router_success_rate", "Moving average success rate per task and model", ["task", "model"])
+
+
+class ModelRouterError(RuntimeError):
+    """
+    Every candidate model failed for a call; the last failure is chained as __cause__ and
+    ``output`` holds the last output a validator rejected (None if no model answered).
+    """
+
+    def __init__(self, message: str, output: Any = None):
+        super().__init__(message)
+        self.output = output
+
+
+class ModelStats:
+    """Moving averages of one model on one task."""
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.latency: Optional[float] = None  # seconds, successful calls
+        self.success_rate = 1.0
+        self.calls = 0
+        self.failures = 0
+        self.last_failure = 0.0
+        self.last_call = 0.0
+
+    def record(self, ok: bool, seconds: float):
+        self.calls += 1
+        self.last_call = time.monotonic()
+        self.success_rate += self.alpha * ((1.0 if ok else 0.0) - self.success_rate)
+        if ok:
+            self.latency = seconds if self.latency is None else self.latency + self.alpha * (seconds - self.latency)
+        else:
+            self.failures += 1
+            self.last_failure = time.monotonic()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "failures": self.failures, "success_rate": round(self.success_rate, 3),
+                "latency_seconds": round(self.latency, 3) if self.latency is not None else None}
+
+
+class ModelRouter:
+    def __init__(self, config: Dict[str, Any]):
+        self.models: Dict[str, Dict[str, Any]] = config.get("models", {})
+        self.tasks: Dict[str, Dict[str, Any]] = config.get("tasks", {})
+        self.min_success_rate = config.get("min_success_rate", 0.5)
+        self.retry_after_seconds = config.get("retry_after_seconds", 120)
+        self.alpha = config.get("ewma_alpha", 0.3)
+        self._stats: Dict[tuple, ModelStats] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None) -> "ModelRouter":
+        path = path or os.environ.get(CONFIG_ENV_VAR) or str(DEFAULT_CONFIG_PATH)
+        return cls(json.loads(Path(path).read_text()))
+
+    def task_config(self, task: str) -> Dict[str, Any]:
+        return self.tasks.get(task) or self.tasks.get("default") or {"models": ["llama3"]}
+
+    def stats_for(self, task: str, model: str) -> ModelStats:
+        with self._lock:
+            return self._stats.setdefault((task, model), ModelStats(self.alpha))
+
+    def candidates(self, task: str, prompt_chars: int) -> List[str]:
+        """
+        Models to try in order: the ones that fit the prompt (cheapest first), healthy and within the
+        latency budget, then healthy but slow, then failing.
+        """
+        config = self.task_config(task)
+        models = config["models"]
+        budget = config.get("latency_budget_seconds")
+        fitting = [m for m in models if prompt_chars <= self.models.get(m, {}).get("max_prompt_chars", float("inf"))]
+        fitting = fitting or models[-1:]  # nothing fits: the largest one is the best bet
+        now = time.monotonic()
+        fast, slow, sick = [], [], []
+        for model in fitting:
+            stats = self.stats_for(task, model)
+            if stats.success_rate < self.min_success_rate and now - stats.last_failure < self.retry_after_seconds:
+                sick.append(model)
+            elif budget is not None and stats.latency is not None and stats.latency > budget \
+                    and now - stats.last_call < self.retry_after_seconds:
+                slow.append(model)
+            else:
+                fast.append(model)
+        return fast + slow + sick
+
+    def _record(self, task: str, model: str, outcome: str, seconds: float, error: Optional[BaseException] = None):
+        stats = self.stats_for(task, model)
+        stats.record(outcome == "ok", seconds)
+        ROUTER_CALLS.inc(task=task, model=model, outcome=outcome)
+        ROUTER_SUCCESS_RATE.set(stats.success_rate, task=task, model=model)
+        if stats.latency is not None:
+            ROUTER_LATENCY.set(stats.latency, task=task, model=model)
+        if error is not None:
+            logger.warning("model %s failed on %s (%s: %s), falling back", model, task, outcome, error)
+
+    def run(self, task: str, messages: List[Dict[str, Any]], generate: Callable[[str], Any],
+            validate: Optional[Callable[[Any], Any]] = None, priority: str = "interactive",
+            options: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        generate(model) -> output; validate(output) raises if the output can't be used.
+        options: whatever else generate() sends that changes the answer (tools, format, ...), so only
+        identical requests are coalesced.
+        """
+        timeout = self.task_config(task).get("timeout_seconds")
+        last_error = last_output = None
+        for model in self.candidates(task, prompt_chars(messages)):
+            call = _TimedCall(generate, model)
+            try:
+                output = SCHEDULER.run(model, prompt_key(model, messages, **(options or {})), call, priority, timeout)
+            except QueueFull:
+                raise  # the queue is shared by all models, another one won't get in either
+            except concurrent.futures.TimeoutError as e:
+                self._record(task, model, "timeout", call.seconds(), e)
+                last_error = e
+                continue
+            except Exception as e:
+                self._record(task, model, "error", call.seconds(), e)
+                last_error = e
+                continue
+            if not self._valid(task, model, output, validate, call):
+                last_error, last_output = ValueError(f"{model} returned unusable output"), output
+                continue
+            self._record(task, model, "ok", call.seconds())
+            return output
+        raise ModelRouterError(f"no model could handle task {task!r}", last_output) from last_error
+
+    async def run_async(self, task: str, messages: List[Dict[str, Any]], generate: Callable[[str], Any],
+                        validate: Optional[Callable[[Any], Any]] = None, priority: str = "interactive",
+                        options: Optional[Dict[str, Any]] = None) -> Any:
+        timeout = self.task_config(task).get("timeout_seconds")
+        last_error = last_output = None
+        for model in self.candidates(task, prompt_chars(messages)):
+            call = _TimedCall(generate, model)
+            try:
+                output = await SCHEDULER.run_async(model, prompt_key(model, messages, **(options or {})), call,
+                                                   priority, timeout)
+            except QueueFull:
+                raise
+            except asyncio.TimeoutError as e:
+                self._record(task, model, "timeout", call.seconds(), e)
+                last_error = e
+                continue
+            except Exception as e:
+                self._record(task, model, "error", call.seconds(), e)
+                last_error = e
+                continue
+            if not self._valid(task, model, output, validate, call):
+                last_error, last_output = ValueError(f"{model} returned unusable output"), output
+                continue
+            self._record(task, model, "ok", call.seconds())
+            return output
+        raise ModelRouterError(f"no model could handle task {task!r}", last_output) from last_error
+
+    def _valid(self, task: str, model: str, output: Any, validate, call: "_TimedCall") -> bool:
+        if validate is None:
+            return True
+        try:
+            validate(output)
+        except Exception as e:
+            self._record(task, model, "invalid", call.seconds(), e)
+            return False
+        return True
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {f"{task}/{model}": s.as_dict() for (task, model), s in self._stats.items()}
+
+
+class _TimedCall:
+    """generate(model) as the scheduler's job, timing the generation itself rather than queueing."""
+
+    def __init__(self, generate: Callable[[str], Any], model: str):
+        self.generate = generate
+        self.model = model
+        self.submitted = time.perf_counter()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def __call__(self) -> Any:
+        self.started = time.perf_counter()
+        try:
+            return self.generate(self.model)
+        finally:
+            self.finished = time.perf_counter()
+
+    def seconds(self) -> float:
+        # a coalesced call never runs this instance: fall back to the time the caller waited
+        if self.started is None:
+            return time.perf_counter() - self.submitted
+        return (self.finished or time.perf_counter()) - self.started
+
+
+def prompt_chars(messages: List[Dict[str, Any]]) -> int:
+    return sum(len(str(m.get("content") or "")) for m in messages)
+
+
+# shared by ollama_app_access, xml_api_demo and the MCP clients
+ROUTER = ModelRouter.from_file()
@@ -1,23 +1,37 @@
-import requests
-import ollama
 import json
 import logging
+import os
 import sys
+import time
+
+import metrics
+from model_router import ROUTER, ModelRouterError
+from session_replay import SessionRecorder
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 logger.addHandler(logging.StreamHandler(sys.stdout))
 
 BASE = "http://127.0.0.1:8000"
 
+# set RECORD_SESSION=<file> to capture instructions, completions and API calls for session_replay.py
+RECORDER = SessionRecorder(os.environ["RECORD_SESSION"]) if os.environ.get("RECORD_SESSION") else None
+
 
 # ---------- API Helpers ----------
 
 def call_api(method, path, **kwargs):
     url = f"{BASE}{path}"
-    logger.debug(f"Calling {url} with {kwargs}")
-    resp = requests.request(method, url, **kwargs)
-    resp.raise_for_status()
-    return resp.json()
+    logger.debug(f"Calling {method} {url}")
+    import requests  # deferred with ollama below: importing both cost ~300ms before anything ran
+
+    with metrics.span("api_call"):
+        resp = requests.request(method, url, **kwargs)
+        if RECORDER:
+            is_json = resp.headers.get("content-type", "").startswith("application/json")
+            RECORDER.api_call(method, path, kwargs, resp.status_code, resp.json() if is_json else resp.text)
+        resp.raise_for_status()
+        return resp.json()
 
 
 def show_project(session_key):
@@ -27,14 +41,70 @@ def show_project(session_key):
     return data
 
 
+def watch_project(session_key, since=None):
+    """
+    Follow project changes instead of polling show_project: yields (event, data) from /watch_project.
+    Remember data["seq"] / the event id to resume; on "reset" re-read the project with show_project.
+    """
+    params = {"session_key": session_key}
+    if since:
+        params["since"] = since
+    import requests
+
+    with requests.get(f"{BASE}/watch_project", params=params, stream=True) as resp:
+        resp.raise_for_status()
+        event = None
+        for line in resp.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:") and event:
+                yield event, json.loads(line[len("data:"):])
+                event = None
+
+
 # ---------- LLM Helpers ----------
 
-def ask_ollama(prompt):
-    response = ollama.chat(
-        model="llama3",  # or llama3.1 etc.
-        messages=[{"role": "user", "content": prompt}]
+def ask_ollama(prompt, priority="interactive"):
+    # the router picks the model (model_router_config.json) and falls back when one fails or answers
+    # without JSON; calls go through the shared scheduler (bounded queue, per-model limits, coalescing)
+    messages = [{"role": "user", "content": prompt}]
+    try:
+        return ROUTER.run("api_actions", messages, lambda model: stream_chat(model, messages),
+                          validate=require_json, priority=priority)
+    except ModelRouterError as e:
+        # no model gave usable JSON: the demo logs the last answer and skips the instruction, as before routing
+        logger.warning(f"⚠️ no model returned usable JSON: {e.__cause__ or e}")
+        return e.output or ""
+
+
+def require_json(text):
+    if not extract_all_json(text):
+        raise ValueError("no JSON object in model output")
+
+
+def stream_chat(model, messages):
+    # streamed so time-to-first-token can be measured separately from total generation
+    import ollama
+
+    started = time.perf_counter()
+    stream = ollama.chat(
+        model=model,
+        messages=messages,
+        stream=True,
     )
-    return response["message"]["content"]
+    parts = []
+    first_token = None
+    for chunk in stream:
+        content = chunk["message"]["content"]
+        if content:
+            if first_token is None:
+                first_token = time.perf_counter()
+                metrics.observe_stage("llm_time_to_first_token", first_token - started)
+            parts.append(content)
+        if chunk.get("done"):
+            metrics.record_tokens(chunk.get("prompt_eval_count"), chunk.get("eval_count"))
+    metrics.observe_stage("llm_generation", time.perf_counter() - started)
+    return "".join(parts)
 
 
 def extract_all_json(text: str):
@@ -81,16 +151,22 @@ def normalize_message(cmd: dict) -> dict:
 def process_action(action: str, payload: dict, session_key: str):
     """Execute a single action with normalized payload."""
     if action == "set_structure":
-        payload = {"session_key": session_key, "structure": normalize_structure(payload)}
+        with metrics.span("normalization"):
+            payload = {"session_key": session_key, "structure": normalize_structure(payload)}
         return call_api("POST", "/set_structure", json=payload)
 
     elif action == "set_message":
-        payload = {"session_key": session_key, "message": normalize_message(payload)}
+        with metrics.span("normalization"):
+            payload = {"session_key": session_key, "message": normalize_message(payload)}
         return call_api("POST", "/set_message", json=payload)
 
     elif action == "get_project_data":
         return show_project(session_key)
 
+    elif action == "query_messages":
+        payload = {**payload, "session_key": session_key}
+        return call_api("POST", "/query_messages", json=payload)
+
     else:
         return {"error": f"Unknown action {action}"}
 
@@ -104,6 +180,8 @@ def demo():
     sess = call_api("POST", "/get_session", json={"project_name": "demo_project"})
     session_key = sess["session_key"]
     logger.info(f"✅ Session created: {session_key}")
+    if RECORDER:
+        RECORDER.start_session(sess["project_name"], session_key)
 
     # 2. Define interactions (natural language)
     instructions = [
@@ -117,7 +195,10 @@ def demo():
     # 3. Run interactions
     for instr in instructions:
         logger.info(f"\n👉 Instruction: {instr}")
-        llm_prompt = f"""
+        if RECORDER:
+            RECORDER.instruction(instr)
+        with metrics.span("prompt_build"):
+            llm_prompt = f"""
         You are an assistant controlling an API. 
         Here is the schema you MUST follow exactly:
 
@@ -125,11 +206,17 @@ def demo():
 
         Instruction: {instr}
         """
+        llm_started = time.perf_counter()
         llm_output = ask_ollama(llm_prompt)
+        if RECORDER:
+            RECORDER.completion(llm_output, time.perf_counter() - llm_started)
         logger.info(f"🔹 LLM Raw Output:\n{llm_output}")
 
         # Parse all JSON objects
-        actions = extract_all_json(llm_output)
+        with metrics.span("json_extraction"):
+            actions = extract_all_json(llm_output)
+        if RECORDER:
+            RECORDER.actions(actions)
         logger.info(f"<UNK> Actions:\n{json.dumps(actions, indent=2)}")
         if not actions:
             logger.error("⚠️ No valid JSON extracted, skipping...")
@@ -142,6 +229,11 @@ def demo():
                 result = process_action(action, payload, session_key)
                 logger.info(f"✅ API Response: {json.dumps(result, indent=2)}")
 
+    logger.info("\n=== Client pipeline metrics ===")
+    logger.info(metrics.render())
+    if not metrics.push(metrics.PUSH_URL or f"{BASE}/_metrics/ingest"):
+        logger.warning("⚠️ could not push the pipeline metrics to the app's /_metrics")
+
 
 if __name__ == "__main__":
     demo()
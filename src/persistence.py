@@ -0,0 +1,311 @@
+# persistence.py
+"""
+Durability for the in-memory project store: an append-only write-ahead log with group commit,
+plus periodic compacted snapshots.
+
+On disk (``data_dir``):
+  wal-<first_seq>.ndjson  log segments, one mutation per line: ``<seq>\\t<json record>``
+  snapshot.ndjson         header ``{"seq": S}`` followed by one record per line describing the full state at S
+
+Startup loads the snapshot and replays the log tail (records with seq > S) through the same
+``apply`` callback used for snapshot records, so a snapshot is just a compacted log.
+
+Writers call ``append(payload)`` which returns a ``concurrent.futures.Future``; a single writer
+thread batches everything queued since its last flush into one write + fsync (group commit) and
+then resolves all the futures of that batch.
+"""
+import gc
+import json
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional, only makes encoding / recovery faster
+    orjson = None
+
+SNAPSHOT_FILE = "snapshot.ndjson"
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".ndjson"
+
+
+# orjson rejects integers beyond 64 bits when encoding and turns them into floats when decoding;
+# anything outside int64/uint64 has at least 19 digits (-9223372036854775809 has exactly 19)
+_LONG_NUMBER = re.compile(rb"-?\d{19,}")
+_ORJSON_INTS = range(-(2 ** 63), 2 ** 64)
+
+
+def dumps(record: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(record)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def loads(data: bytes) -> Dict[str, Any]:
+    if orjson is not None and all(int(m.group()) in _ORJSON_INTS for m in _LONG_NUMBER.finditer(data)):
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def fsync_dir(path: Path):
+    """Make renames, new files and unlinks in path durable (the entries live in the directory, not the files)."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# -----------------------------
+# Write-ahead log
+# -----------------------------
+class WriteAheadLog:
+    def __init__(self, data_dir: Path, next_seq: int = 1, fsync: bool = True, max_batch: int = 4096):
+        self.data_dir = Path(data_dir)
+        self.fsync = fsync
+        self.max_batch = max_batch
+        self._seq_lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._next_seq = next_seq
+        self._queue: "queue.Queue[Optional[Tuple[int, bytes, Future]]]" = queue.Queue()
+        self._file = self._open_segment(next_seq)
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="wal-writer", daemon=True)
+        self._writer.start()
+
+    @property
+    def last_seq(self) -> int:
+        return self._next_seq - 1
+
+    def _open_segment(self, first_seq: int):
+        path = self.data_dir / f"{SEGMENT_PREFIX}{first_seq:020d}{SEGMENT_SUFFIX}"
+        f = path.open("ab")
+        if self.fsync:
+            fsync_dir(self.data_dir)  # otherwise fsynced records can vanish with the segment's entry
+        return f
+
+    def append(self, payload: bytes) -> Future:
+        """Queue an already-encoded record; the future resolves to its seq once it is durable."""
+        if self._closed:
+            raise RuntimeError("write-ahead log is closed")
+        commit: Future = Future()
+        with self._seq_lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._queue.put((seq, payload, commit))
+        return commit
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            # group commit: take everything that queued up while the previous batch was syncing
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._flush(batch)
+                    return
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[int, bytes, Future]]):
+        data = b"".join(b"%d\t%s\n" % (seq, payload) for seq, payload, _ in batch)
+        try:
+            with self._file_lock:
+                self._file.write(data)
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+        except Exception as e:
+            for _, _, commit in batch:
+                commit.set_exception(e)
+            return
+        for seq, _, commit in batch:
+            commit.set_result(seq)
+
+    def roll(self) -> int:
+        """
+        Start a new segment and return the last seq assigned so far.
+        The caller must stop appends while rolling so nothing newer lands in the old segment.
+        """
+        with self._seq_lock:
+            last_seq = self._next_seq - 1
+            with self._file_lock:
+                self._file.close()
+                self._file = self._open_segment(self._next_seq)
+        return last_seq
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        with self._file_lock:
+            self._file.close()
+
+
+def list_segments(data_dir: Path) -> List[Tuple[int, Path]]:
+    segments = []
+    for path in Path(data_dir).glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"):
+        first_seq = int(path.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+        segments.append((first_seq, path))
+    return sorted(segments)
+
+
+def truncate_torn_tail(path: Path):
+    """Cut a partially written last line so new appends start on a clean line."""
+    valid = 0
+    with path.open("rb") as f:
+        for line in f:
+            if not line.endswith(b"\n") or b"\t" not in line:
+                break
+            valid += len(line)
+    if valid < path.stat().st_size:
+        with path.open("r+b") as f:
+            f.truncate(valid)
+
+
+def read_segment(path: Path) -> Iterator[Tuple[int, bytes]]:
+    with path.open("rb") as f:
+        for line in f:
+            seq, sep, payload = line.rstrip(b"\n").partition(b"\t")
+            if not sep or not line.endswith(b"\n"):
+                return  # torn tail write from a crash, nothing after it was acknowledged
+            yield int(seq), payload
+
+
+# -----------------------------
+# Snapshot + recovery
+# -----------------------------
+class ProjectPersistence:
+    """
+    Ties the log and snapshots to a store.
+
+    dump_state() -> iterable of records describing the whole store; called with appends stopped,
+                    it should copy what it needs and may return a lazy iterable over that copy
+    apply(record) -> applies one record (from the snapshot or the log) to the store
+    pause_writes   -> context manager the store uses to serialize mutations + appends
+    """
+
+    def __init__(self, data_dir: str, dump_state: Callable[[], Iterable[Dict[str, Any]]],
+                 apply: Callable[[Dict[str, Any]], None], pause_writes,
+                 snapshot_every: int = 100_000, fsync: bool = True):
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.dump_state = dump_state
+        self.apply = apply
+        self.pause_writes = pause_writes
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.wal: Optional[WriteAheadLog] = None
+        self.snapshot_seq = 0
+        self._since_snapshot = 0
+        self._snapshot_running = threading.Lock()
+
+    def recover(self) -> Dict[str, Any]:
+        """Load snapshot + replay log tail, then open the log for new writes."""
+        started = time.perf_counter()
+        # recovery only allocates long-lived objects; cyclic GC passes over them are pure overhead
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._recover(started)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def _recover(self, started: float) -> Dict[str, Any]:
+        snapshot_records = 0
+        snapshot_path = self.data_dir / SNAPSHOT_FILE
+        if snapshot_path.exists():
+            with snapshot_path.open("rb") as f:
+                self.snapshot_seq = loads(f.readline())["seq"]
+                for line in f:
+                    self.apply(loads(line))
+                    snapshot_records += 1
+
+        last_seq = self.snapshot_seq
+        replayed = 0
+        segments = list_segments(self.data_dir)
+        if segments:
+            truncate_torn_tail(segments[-1][1])
+        for _, path in segments:
+            for seq, payload in read_segment(path):
+                if seq <= last_seq:
+                    continue
+                self.apply(loads(payload))
+                last_seq = seq
+                replayed += 1
+
+        self._since_snapshot = replayed
+        self.wal = WriteAheadLog(self.data_dir, next_seq=last_seq + 1, fsync=self.fsync)
+        return {
+            "snapshot_seq": self.snapshot_seq,
+            "snapshot_records": snapshot_records,
+            "log_records_replayed": replayed,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def append(self, payload: bytes) -> Future:
+        """
+        Log an encoded record (see ``dumps``, best done before taking the store lock).
+        Must be called while the store holds pause_writes, right after applying the record.
+        """
+        commit = self.wal.append(payload)
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every and not self._snapshot_running.locked():
+            threading.Thread(target=self.snapshot, name="wal-snapshot", daemon=True).start()
+        return commit
+
+    def snapshot(self) -> int:
+        """Write a compacted snapshot and drop the log segments it covers."""
+        if not self._snapshot_running.acquire(blocking=False):
+            return self.snapshot_seq
+        try:
+            with self.pause_writes:
+                seq = self.wal.roll()
+                records = self.dump_state()
+                self._since_snapshot = 0
+
+            tmp_path = self.data_dir / (SNAPSHOT_FILE + ".tmp")
+            with tmp_path.open("wb") as f:
+                f.write(dumps({"seq": seq}) + b"\n")
+                for record in records:
+                    f.write(dumps(record) + b"\n")
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, self.data_dir / SNAPSHOT_FILE)
+            if self.fsync:
+                # the rename must be durable before the segments it replaces are unlinked: after a crash
+                # the unlinks could otherwise survive while the old snapshot is still in place
+                fsync_dir(self.data_dir)
+            self.snapshot_seq = seq
+
+            # every segment but the one just opened holds only seq <= snapshot seq
+            segments = list_segments(self.data_dir)
+            for first_seq, path in segments[:-1]:
+                if first_seq <= seq:
+                    path.unlink()
+            return seq
+        finally:
+            self._snapshot_running.release()
+
+    def close(self):
+        if self.wal is not None:
+            self.wal.close()
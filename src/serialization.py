@@ -0,0 +1,45 @@
+# serialization.py
+"""
+JSON encoding for app.py's large responses and write path.
+
+Handlers build plain dicts of already validated data and return them as ``JSONBytes``, encoded once,
+straight to bytes, by orjson when installed or pydantic-core's compiled ``to_json`` otherwise -
+instead of FastAPI's default ``jsonable_encoder`` pass (walks and copies every value) + ``json.dumps``.
+"""
+from typing import Any
+
+import pydantic_core
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional, pydantic-core's encoder is used instead
+    orjson = None
+
+
+def _default(obj: Any):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON bytes; datetimes as ISO 8601, pydantic models as their dump."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default)
+        except orjson.JSONEncodeError:
+            pass  # e.g. integers beyond 64 bits, which JSON and pydantic-core allow
+    return pydantic_core.to_json(obj)
+
+
+class JSONBytes(Response):
+    """JSON response encoded with dumps(); already encoded bytes are sent as they are."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -0,0 +1,190 @@
+# session_replay.py
+"""
+Record agent sessions against app.py and replay them later without running a model.
+
+Recording (compact NDJSON, one record per line, ``t`` = seconds since the session started):
+    {"t":0.0,"kind":"session","project_name":"demo_project"}
+    {"t":0.01,"kind":"instruction","text":"..."}
+    {"t":2.4,"kind":"completion","text":"...","llm_seconds":2.39}
+    {"t":2.4,"kind":"actions","actions":[...]}
+    {"t":2.41,"kind":"api","method":"POST","path":"/set_structure","json":{...},"status":200,"response":{...}}
+
+The live session key is stored as ``$SESSION_KEY`` so every replayed session can use its own.
+Enable recording in ollama_app_access.py with ``RECORD_SESSION=sessions.ndjson``.
+
+Replay many concurrent copies of the recorded sessions:
+    python session_replay.py sessions.ndjson --sessions 50 --concurrency 10 --pacing fast
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SESSION_KEY_PLACEHOLDER = "$SESSION_KEY"
+
+
+def _substitute(value: Any, old: str, new: str) -> Any:
+    if isinstance(value, str):
+        return new if value == old else value
+    if isinstance(value, dict):
+        return {k: _substitute(v, old, new) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, old, new) for v in value]
+    return value
+
+
+# -----------------------------
+# Recording
+# -----------------------------
+class SessionRecorder:
+    """Append-only writer for session logs; safe to share between threads."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._file = self.path.open("a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self.session_key: Optional[str] = None
+
+    def _write(self, kind: str, **fields):
+        record = {"t": round(time.perf_counter() - self._started, 6), "kind": kind, **fields}
+        if self.session_key:
+            record = _substitute(record, self.session_key, SESSION_KEY_PLACEHOLDER)
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def start_session(self, project_name: str, session_key: str):
+        self._started = time.perf_counter()
+        self.session_key = session_key
+        self._write("session", project_name=project_name)
+
+    def instruction(self, text: str):
+        self._write("instruction", text=text)
+
+    def completion(self, text: str, llm_seconds: float):
+        self._write("completion", text=text, llm_seconds=round(llm_seconds, 6))
+
+    def actions(self, actions: List[Any]):
+        self._write("actions", actions=actions)
+
+    def api_call(self, method: str, path: str, kwargs: Dict[str, Any], status: int, response: Any):
+        request = {k: kwargs[k] for k in ("json", "params") if k in kwargs}
+        self._write("api", method=method, path=path, status=status, response=response, **request)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def load_sessions(path: str) -> List[Dict[str, Any]]:
+    """Split a log into sessions: [{"project_name": ..., "records": [...]}, ...]."""
+    sessions: List[Dict[str, Any]] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record["kind"] == "session":
+                sessions.append({"project_name": record["project_name"], "records": []})
+            elif sessions:
+                sessions[-1]["records"].append(record)
+    return sessions
+
+
+# -----------------------------
+# Replay
+# -----------------------------
+class ReplayStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors = 0
+        self.status_mismatches = 0
+
+    def add(self, path: str, seconds: float, ok: bool, status_matches: bool):
+        with self._lock:
+            self.latencies.setdefault(path, []).append(seconds)
+            if not ok:
+                self.errors += 1
+            if not status_matches:
+                self.status_mismatches += 1
+
+
+def replay_session(base: str, session: Dict[str, Any], copy_index: int, pacing: str, speed: float,
+                   stats: ReplayStats, same_project: bool = False):
+    import requests  # only replay needs it; ollama_app_access imports SessionRecorder at startup
+
+    http = requests.Session()
+    project_name = session["project_name"] if same_project else f"{session['project_name']}_replay{copy_index}"
+    resp = http.post(f"{base}/get_session", json={"project_name": project_name})
+    resp.raise_for_status()
+    session_key = resp.json()["session_key"]
+
+    started = time.perf_counter()
+    for record in session["records"]:
+        if record["kind"] != "api" or record["path"] == "/get_session":
+            continue
+        if pacing == "recorded":
+            delay = started + record["t"] / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        kwargs = {k: _substitute(record[k], SESSION_KEY_PLACEHOLDER, session_key)
+                  for k in ("json", "params") if k in record}
+        call_started = time.perf_counter()
+        try:
+            resp = http.request(record["method"], f"{base}{record['path']}", **kwargs)
+            status = resp.status_code
+        except requests.RequestException:
+            status = -1
+        stats.add(record["path"], time.perf_counter() - call_started,
+                  ok=200 <= status < 300, status_matches=status == record.get("status"))
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded agent sessions against app.py")
+    parser.add_argument("log", help="NDJSON session log written by SessionRecorder")
+    parser.add_argument("--base", default="http://127.0.0.1:8000")
+    parser.add_argument("--sessions", type=int, default=10, help="number of replayed sessions")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pacing", choices=["fast", "recorded"], default="fast")
+    parser.add_argument("--speed", type=float, default=1.0, help="recorded pacing multiplier")
+    parser.add_argument("--same-project", action="store_true", help="replay into the recorded project names")
+    args = parser.parse_args()
+
+    sessions = load_sessions(args.log)
+    if not sessions:
+        raise SystemExit(f"no sessions found in {args.log}")
+
+    stats = ReplayStats()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(replay_session, args.base, sessions[i % len(sessions)], i, args.pacing,
+                               args.speed, stats, args.same_project)
+                   for i in range(args.sessions)]
+        for f in futures:
+            f.result()
+    elapsed = time.perf_counter() - started
+
+    calls = sum(len(v) for v in stats.latencies.values())
+    print(f"sessions={args.sessions} concurrency={args.concurrency} pacing={args.pacing} "
+          f"calls={calls} errors={stats.errors} status_mismatches={stats.status_mismatches}")
+    print(f"elapsed={elapsed:.2f}s throughput={calls / elapsed:.1f} calls/s")
+    for path, values in sorted(stats.latencies.items()):
+        ms = [v * 1000 for v in values]
+        print(f"  {path:<22} n={len(ms):<6} p50={statistics.median(ms):.2f}ms "
+              f"p95={_percentile(ms, 95):.2f}ms max={max(ms):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
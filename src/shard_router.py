@@ -0,0 +1,319 @@
+# shard_router.py
+"""
+Thin router that spreads projects over several app.py processes (shards) by consistent hashing.
+
+Each project lives on exactly one shard: hash(project_name) on a ring of virtual nodes picks it.
+The router forwards
+  - /get_session               by the project_name in the body
+  - /set_*, /get_project_data, /query_messages, ... by the project bound to the session_key
+Session keys are resolved through a local cache; on a miss every shard is asked
+(``/_session_lookup``), so sessions keep working across router restarts and with several routers.
+A shard that is down or fails answers 502; 401 means every shard answered and none knows the key.
+``/_metrics`` and ``/_snapshot`` go to every shard (metrics get a ``shard`` label), ``/_health``
+reports every shard.
+
+Run against existing shards (other machines, or processes started by hand):
+    SHARD_NODES=http://10.0.0.1:8000,http://10.0.0.2:8000 uvicorn shard_router:app --port 8000
+or let it start N local shards on one machine (ports 8001..8000+N):
+    python shard_router.py --local 4 --port 8000 [--data-dir ./shards]
+
+Changing the node list moves the projects whose hash owner changes; their data is not migrated,
+so grow the ring with a new data layout (or move the affected projects) rather than in place.
+"""
+import argparse
+import asyncio
+import atexit
+import bisect
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+VIRTUAL_NODES = 64
+# routes whose JSON body carries the session_key
+BODY_ROUTES = ["/set_structure", "/set_message", "/query_messages"]
+# GET routes with a session_key query parameter
+QUERY_ROUTES = ["/get_project_data", "/get_structure", "/project_memory_report"]
+
+
+# -----------------------------
+# Consistent hashing
+# -----------------------------
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, nodes: List[str], virtual_nodes: int = VIRTUAL_NODES):
+        if not nodes:
+            raise ValueError("hash ring needs at least one node")
+        self.nodes = list(nodes)
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(virtual_nodes))
+        self._keys = [p for p, _ in points]
+        self._owners = [n for _, n in points]
+
+    def node_for(self, key: str) -> str:
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[i]
+
+
+# -----------------------------
+# Router app
+# -----------------------------
+class ShardRouter:
+    def __init__(self, nodes: List[str]):
+        self.ring = HashRing(nodes)
+        self.sessions: Dict[str, str] = {}  # session_key -> project_name
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        self.client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=None))
+
+    async def stop(self):
+        if self.client is not None:
+            await self.client.aclose()
+
+    async def project_for_session(self, session_key: str) -> str:
+        project_name = self.sessions.get(session_key)
+        if project_name is not None:
+            return project_name
+
+        async def ask(node: str):
+            resp = await self.client.get(f"{node}/_session_lookup", params={"session_key": session_key})
+            if resp.status_code == 401:
+                return None  # the shard doesn't know the key
+            resp.raise_for_status()
+            return resp.json()["project_name"]
+
+        results = await asyncio.gather(*(ask(n) for n in self.ring.nodes), return_exceptions=True)
+        for result in results:
+            if isinstance(result, str):
+                self.sessions[session_key] = result
+                return result
+        failed = [node for node, result in zip(self.ring.nodes, results) if isinstance(result, Exception)]
+        if failed:
+            # the key may live on a shard that didn't answer: not the client's fault
+            raise HTTPException(status_code=502, detail=f"session lookup failed on {', '.join(failed)}")
+        raise HTTPException(status_code=401, detail="Invalid or expired session_key")
+
+    async def owner_for_session(self, session_key: Optional[str]) -> str:
+        if not session_key:
+            raise HTTPException(status_code=422, detail="session_key is required")
+        return self.ring.node_for(await self.project_for_session(session_key))
+
+    async def forward(self, node: str, request: Request, body: Optional[bytes] = None) -> Response:
+        try:
+            resp = await self.client.request(
+                request.method,
+                f"{node}{request.url.path}",
+                params=request.query_params,
+                content=body,
+                headers={"content-type": request.headers.get("content-type", "application/json")},
+            )
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"shard {node} unavailable: {e!r}")
+        return Response(content=resp.content, status_code=resp.status_code,
+                        media_type=resp.headers.get("content-type"))
+
+
+    async def fan_out(self, method: str, path: str) -> Dict[str, object]:
+        """The same request to every shard: node -> httpx.Response, or the exception it raised."""
+        results = await asyncio.gather(*(self.client.request(method, f"{n}{path}") for n in self.ring.nodes),
+                                       return_exceptions=True)
+        return dict(zip(self.ring.nodes, results))
+
+
+def _with_shard_label(sample: str, node: str) -> str:
+    name, sep, rest = sample.partition("{")
+    if sep:
+        return f'{name}{{shard="{node}",{rest}'
+    name, _, value = sample.partition(" ")
+    return f'{name}{{shard="{node}"}} {value}'
+
+
+def merge_shard_metrics(texts: Dict[str, str]) -> str:
+    """Prometheus text of several shards as one exposition: samples grouped per family, shard label added."""
+    headers: Dict[str, List[str]] = {}  # family -> its HELP / TYPE lines (from the first shard that has it)
+    samples: Dict[str, List[str]] = {}
+    for node, text in texts.items():
+        family = None
+        for line in text.splitlines():
+            if line.startswith(("# HELP ", "# TYPE ")):
+                family = line.split()[2]
+                if len(headers.setdefault(family, [])) < 2 and line not in headers[family]:
+                    headers[family].append(line)
+                samples.setdefault(family, [])
+            elif line and not line.startswith("#") and family is not None:
+                samples[family].append(_with_shard_label(line, node))
+    return "".join("\n".join(headers[f] + samples[f]) + "\n" for f in headers)
+
+
+def create_app(nodes: List[str]) -> FastAPI:
+    router = ShardRouter(nodes)
+    router_app = FastAPI(title="LLM-demo API (shard router)",
+                         on_startup=[router.start], on_shutdown=[router.stop])
+    router_app.state.router = router
+
+    @router_app.post("/get_session")
+    async def get_session(request: Request):
+        body = await request.body()
+        try:
+            project_name = json.loads(body)["project_name"]
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=422, detail="project_name is required")
+        resp = await router.forward(router.ring.node_for(str(project_name)), request, body)
+        if resp.status_code == 200:
+            router.sessions[json.loads(resp.body)["session_key"]] = project_name
+        return resp
+
+    async def forward_by_body(request: Request):
+        body = await request.body()
+        try:
+            session_key = json.loads(body).get("session_key")
+        except (ValueError, AttributeError):
+            raise HTTPException(status_code=422, detail="body must be a JSON object with a session_key")
+        return await router.forward(await router.owner_for_session(session_key), request, body)
+
+    async def forward_by_query(request: Request):
+        node = await router.owner_for_session(request.query_params.get("session_key"))
+        return await router.forward(node, request)
+
+    for path in BODY_ROUTES:
+        router_app.add_api_route(path, forward_by_body, methods=["POST"])
+    for path in QUERY_ROUTES:
+        router_app.add_api_route(path, forward_by_query, methods=["GET"])
+
+    @router_app.get("/watch_project")
+    async def watch_project(request: Request):
+        node = await router.owner_for_session(request.query_params.get("session_key"))
+        headers = {k: v for k, v in request.headers.items() if k.lower() == "last-event-id"}
+        upstream = router.client.build_request("GET", f"{node}/watch_project",
+                                               params=request.query_params, headers=headers)
+        try:
+            resp = await router.client.send(upstream, stream=True)
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"shard {node} unavailable: {e!r}")
+        if resp.status_code != 200:
+            content = await resp.aread()
+            await resp.aclose()
+            return Response(content=content, status_code=resp.status_code,
+                            media_type=resp.headers.get("content-type"))
+        return StreamingResponse(resp.aiter_raw(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache"}, background=None)
+
+    @router_app.get("/get_schema")
+    async def get_schema(request: Request):
+        return await router.forward(router.ring.nodes[0], request)
+
+    @router_app.get("/_session_lookup")
+    async def session_lookup(session_key: str):
+        return {"session_key": session_key, "project_name": await router.project_for_session(session_key)}
+
+    @router_app.post("/_snapshot")
+    async def snapshot():
+        """Snapshot every shard; the status is the shards' common status, 502 when they differ."""
+        shards, codes = {}, set()
+        for node, resp in (await router.fan_out("POST", "/_snapshot")).items():
+            if isinstance(resp, Exception):
+                shards[node], code = {"status": "down", "error": str(resp)}, 502
+            else:
+                shards[node], code = resp.json(), resp.status_code
+            codes.add(code)
+        return JSONResponse({"shards": shards}, status_code=codes.pop() if len(codes) == 1 else 502)
+
+    @router_app.get("/_metrics")
+    async def metrics_endpoint():
+        texts = {node: resp.text for node, resp in (await router.fan_out("GET", "/_metrics")).items()
+                 if not isinstance(resp, Exception) and resp.status_code == 200}
+        return Response(merge_shard_metrics(texts), media_type="text/plain; version=0.0.4")
+
+    @router_app.post("/_metrics/ingest")
+    async def metrics_ingest(request: Request):
+        # client pipeline metrics aren't per project: one shard keeps them, /_metrics shows them with its label
+        return await router.forward(router.ring.nodes[0], request, await request.body())
+
+    @router_app.get("/_health")
+    async def health():
+        async def shard_health(node: str):
+            try:
+                return (await router.client.get(f"{node}/_health")).json()
+            except httpx.HTTPError as e:
+                return {"status": "down", "error": str(e)}
+
+        shards = dict(zip(router.ring.nodes, await asyncio.gather(*(shard_health(n) for n in router.ring.nodes))))
+        status = "ok" if all(s.get("status") == "ok" for s in shards.values()) else "degraded"
+        return JSONResponse({"status": status, "cached_sessions": len(router.sessions), "shards": shards})
+
+    return router_app
+
+
+def _nodes_from_env() -> List[str]:
+    return [n.strip().rstrip("/") for n in os.environ.get("SHARD_NODES", "").split(",") if n.strip()]
+
+
+# `uvicorn shard_router:app` with SHARD_NODES set
+app = create_app(_nodes_from_env()) if _nodes_from_env() else None
+
+
+# -----------------------------
+# Local multi-process mode
+# -----------------------------
+def start_local_shards(count: int, first_port: int, data_dir: Optional[str]) -> List[str]:
+    nodes, procs = [], []
+    for i in range(count):
+        port = first_port + i
+        env = dict(os.environ)
+        if data_dir:
+            env["PROJECT_DATA_DIR"] = os.path.join(data_dir, f"shard-{i}")
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env))
+        nodes.append(f"http://127.0.0.1:{port}")
+
+    def stop_all():
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait()
+
+    atexit.register(stop_all)
+
+    deadline = time.time() + 30
+    for node in nodes:
+        while True:
+            try:
+                if httpx.get(f"{node}/_health").status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.time() > deadline:
+                raise RuntimeError(f"shard {node} did not start")
+            time.sleep(0.2)
+    return nodes
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Consistent-hash router over app.py shards")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--local", type=int, default=0, help="start this many local shards on port+1, port+2, ...")
+    parser.add_argument("--data-dir", default=None, help="give each local shard its own PROJECT_DATA_DIR under here")
+    parser.add_argument("--nodes", default=None, help="comma separated shard urls (instead of --local)")
+    cli = parser.parse_args()
+
+    if cli.local:
+        shard_nodes = start_local_shards(cli.local, cli.port + 1, cli.data_dir)
+    else:
+        shard_nodes = [n.strip().rstrip("/") for n in (cli.nodes or "").split(",") if n.strip()] or _nodes_from_env()
+    if not shard_nodes:
+        parser.error("give --local N, --nodes or SHARD_NODES")
+    print(f"routing over shards: {shard_nodes}")
+    uvicorn.run(create_app(shard_nodes), host="127.0.0.1", port=cli.port)
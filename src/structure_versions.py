@@ -0,0 +1,49 @@
+# structure_versions.py
+"""
+Version history for project structures.
+
+Every ``set_structure`` that changes a structure adds a new version (1, 2, ...) instead of replacing
+it, so messages can pin the version they were validated against. Versions are stored copy-on-write:
+a field that is unchanged from the previous version is the *same* ``StructureField`` object, so
+adding one field to a 50-field structure stores one new field, not 51.
+"""
+from typing import Any, Dict, List, Optional
+
+
+class StructureHistory:
+    """All versions of one structure name; ``as_of(n)`` is a list index."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._versions: List[Any] = []  # ProjectStructure, version n at index n - 1
+
+    @property
+    def latest(self):
+        return self._versions[-1] if self._versions else None
+
+    @property
+    def latest_version(self) -> int:
+        return len(self._versions)
+
+    def add(self, structure) -> int:
+        """Store ``structure`` as a new version (unless identical to the latest); returns its version."""
+        previous = self.latest
+        if previous is not None:
+            if structure == previous:
+                return self.latest_version
+            shared: Dict[str, Any] = {f.name: f for f in previous.fields}
+            fields = []
+            for field in structure.fields:
+                old = shared.get(field.name)
+                fields.append(old if old is not None and old == field else field)
+            structure = structure.model_copy(update={"fields": fields})
+        self._versions.append(structure)
+        return self.latest_version
+
+    def as_of(self, version: int) -> Optional[Any]:
+        if 1 <= version <= len(self._versions):
+            return self._versions[version - 1]
+        return None
+
+    def versions(self) -> List[Any]:
+        return list(self._versions)
@@ -0,0 +1,98 @@
+"""
+Concurrency stress test for app.py: many writers spread over 1, 2, 4, ... projects.
+
+start the app first:  uvicorn app:app --port 8000 (add --workers / the shard router to compare setups)
+then run:             python testers/concurrency_stress.py --projects 1,2,4,8 --writers-per-project 4 --writes 200
+
+For every project count it reports throughput and latency, then checks that every project holds
+exactly the messages its writers sent (no lost or cross-project writes).
+With per-project locking, total throughput should grow with the project count until the server's
+CPU is saturated, and per-write latency should stay flat.
+"""
+import argparse
+import statistics
+import threading
+import time
+from uuid import uuid4
+
+import requests
+
+BASE = "http://127.0.0.1:8000"
+
+
+def writer(session_key: str, writer_id: int, writes: int, rows: int, latencies: list, errors: list):
+    http = requests.Session()
+    values = [{"username": f"user{i}", "age": i % 90} for i in range(rows)]
+    for i in range(writes):
+        body = {
+            "session_key": session_key,
+            "message": {
+                "name": f"w{writer_id}_m{i}",
+                "payload": [{"structure_name": "user_profile", "type": "user_profile", "values": values}],
+            },
+        }
+        started = time.perf_counter()
+        resp = http.post(f"{BASE}/set_message", json=body)
+        latencies.append(time.perf_counter() - started)
+        if resp.status_code != 200:
+            errors.append(resp.status_code)
+
+
+def run(project_count: int, writers_per_project: int, writes: int, rows: int):
+    run_id = uuid4().hex[:6]
+    sessions = []
+    for p in range(project_count):
+        resp = requests.post(f"{BASE}/get_session", json={"project_name": f"stress_{run_id}_{p}"})
+        session_key = resp.json()["session_key"]
+        requests.post(f"{BASE}/set_structure", json={"session_key": session_key, "structure": {
+            "name": "user_profile",
+            "fields": [{"name": "username", "type": "string", "required": True}, {"name": "age", "type": "int"}],
+        }}).raise_for_status()
+        sessions.append(session_key)
+
+    latencies: list = []
+    errors: list = []
+    threads = [
+        threading.Thread(target=writer, args=(session_key, w, writes, rows, latencies, errors))
+        for session_key in sessions
+        for w in range(writers_per_project)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    expected = writers_per_project * writes
+    wrong = []
+    for session_key in sessions:
+        data = requests.get(f"{BASE}/get_project_data", params={"session_key": session_key}).json()
+        if len(data["messages"]) != expected:
+            wrong.append((data["project_name"], len(data["messages"])))
+
+    ms = sorted(v * 1000 for v in latencies)
+    total = len(latencies)
+    print(f"projects={project_count:<3} writers={len(threads):<4} writes={total:<6} "
+          f"throughput={total / elapsed:8.1f}/s per_project={total / elapsed / project_count:7.1f}/s "
+          f"p50={statistics.median(ms):6.2f}ms p95={ms[int(len(ms) * 0.95)]:6.2f}ms "
+          f"errors={len(errors)} inconsistent_projects={wrong or 0}")
+
+
+def main():
+    global BASE
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base", default=BASE)
+    parser.add_argument("--projects", default="1,2,4,8", help="comma separated project counts")
+    parser.add_argument("--writers-per-project", type=int, default=4)
+    parser.add_argument("--writes", type=int, default=100, help="writes per writer")
+    parser.add_argument("--rows", type=int, default=10, help="rows per message")
+    args = parser.parse_args()
+    BASE = args.base
+
+    for project_count in (int(p) for p in args.projects.split(",")):
+        run(project_count, args.writers_per_project, args.writes, args.rows)
+
+
+if __name__ == "__main__":
+    main()
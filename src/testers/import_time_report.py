@@ -0,0 +1,121 @@
+"""
+Startup-time report: import cost of the demo entry points and MCP server startup, checked against
+startup_budgets.json.
+
+run from anywhere:   python testers/import_time_report.py [--runs 5] [--top 10] [--skip-mcp]
+
+For every module in "imports_ms" it runs `python -X importtime -c "import <module>"` --runs times
+(fresh interpreter each time, cwd=src/), reports the median cumulative import time and the packages
+that cost the most (self time summed per top-level package, so a slow dependency stands out).
+For every server in "mcp_initialize_ms" it starts the server from api_tool_mcp_config.json and
+times the MCP initialize request until the first response. Exits 1 when a median is over budget.
+"""
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent
+BUDGETS_FILE = SRC / "startup_budgets.json"
+MCP_CONFIG_FILE = SRC / "api_tool_mcp_config.json"
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+INITIALIZE = {"jsonrpc": "2.0", "id": 1, "method": "initialize",
+              "params": {"protocolVersion": "2024-11-05", "capabilities": {},
+                         "clientInfo": {"name": "import_time_report", "version": "0"}}}
+
+
+def import_profile(module: str):
+    """-> (cumulative ms of module, {top-level package: self ms})"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=SRC, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    total_us = 0
+    packages = defaultdict(int)
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, _, name = match.groups()
+        packages[name.split(".")[0]] += int(self_us)
+        if name == module:
+            total_us = int(cumulative_us)
+    return total_us / 1000, {name: us / 1000 for name, us in packages.items()}
+
+
+def mcp_initialize_ms(server: str) -> float:
+    cfg = json.loads(MCP_CONFIG_FILE.read_text())["servers"][server]
+    command = [sys.executable if cfg["command"] == "python" else cfg["command"]] + cfg.get("args", [])
+    started = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=SRC, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL)
+    try:
+        proc.stdin.write((json.dumps(INITIALIZE) + "\n").encode())
+        proc.stdin.flush()
+        line = proc.stdout.readline()
+        elapsed = (time.perf_counter() - started) * 1000
+        if not line:
+            raise RuntimeError(f"{server} exited without answering initialize")
+        return elapsed
+    finally:
+        proc.stdin.close()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def check(label: str, samples, budget: float) -> bool:
+    median = statistics.median(samples)
+    ok = median <= budget
+    print(f"{label:<40} median={median:7.1f}ms  min={min(samples):7.1f}ms  budget={budget:6.0f}ms  "
+          f"{'ok' if ok else 'OVER BUDGET'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budgets", default=str(BUDGETS_FILE))
+    parser.add_argument("--runs", type=int, help="default: the budgets file's runs")
+    parser.add_argument("--top", type=int, default=8, help="packages to list per module")
+    parser.add_argument("--skip-mcp", action="store_true", help="only measure imports")
+    args = parser.parse_args()
+
+    budgets = json.loads(Path(args.budgets).read_text())
+    runs = args.runs or budgets.get("runs", 5)
+    all_ok = True
+
+    print(f"== import time ({runs} runs, python -X importtime) ==")
+    for module, budget in budgets["imports_ms"].items():
+        totals, packages = [], defaultdict(list)
+        for _ in range(runs):
+            total, per_package = import_profile(module)
+            totals.append(total)
+            for name, ms in per_package.items():
+                packages[name].append(ms)
+        all_ok &= check(f"import {module}", totals, budget)
+        heaviest = sorted(((statistics.median(v), k) for k, v in packages.items()), reverse=True)[:args.top]
+        print("    " + ", ".join(f"{name} {ms:.0f}ms" for ms, name in heaviest))
+
+    if not args.skip_mcp:
+        print(f"\n== MCP server start -> initialize response ({runs} runs) ==")
+        for server, budget in budgets.get("mcp_initialize_ms", {}).items():
+            try:
+                samples = [mcp_initialize_ms(server) for _ in range(runs)]
+            except Exception as e:
+                print(f"{server:<40} failed: {e}")
+                all_ok = False
+                continue
+            all_ok &= check(server, samples, budget)
+
+    sys.exit(0 if all_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Interactive latency under batch load, with and without llm_scheduler.
+
+start the mock first:  python mock_ollama_server.py --port 11435 --ttft-ms 100 --tps 200 --num-parallel 2
+then run:              python testers/llm_scheduler_bench.py --url http://localhost:11435/api/chat --parallel 2
+
+--batch-workers threads keep sending distinct batch prompts while one interactive prompt is sent every
+--interval seconds. "direct" posts straight to the model server (like the demos used to), "scheduled"
+goes through an LLMScheduler with the same per-model concurrency as the server and one slot reserved
+for interactive work. A last run fires --duplicates identical prompts at once and counts how many
+generations the server actually served (coalescing).
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from uuid import uuid4
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # src/, run from anywhere
+from llm_scheduler import LLMScheduler, QueueFull, prompt_key
+
+MODEL = "llama3"
+
+
+def generate(url: str, prompt: str) -> str:
+    resp = requests.post(url, json={"model": MODEL, "stream": False,
+                                    "messages": [{"role": "user", "content": prompt}]})
+    resp.raise_for_status()
+    return resp.json()["message"]["content"]
+
+
+def served(url: str) -> int:
+    return requests.get(url.replace("/api/chat", "/_health")).json()["requests_served"]
+
+
+def run(mode: str, url: str, scheduler: LLMScheduler, batch_workers: int, probes: int, interval: float):
+    stop = threading.Event()
+    batch_done = [0]
+    rejected = [0]
+
+    def call(prompt: str, priority: str) -> str:
+        if mode == "direct":
+            return generate(url, prompt)
+        messages = [{"role": "user", "content": prompt}]
+        return scheduler.run(MODEL, prompt_key(MODEL, messages), lambda: generate(url, prompt), priority)
+
+    def batch_worker():
+        while not stop.is_set():
+            try:
+                call(f"batch {uuid4().hex}", "batch")
+                batch_done[0] += 1
+            except QueueFull:
+                rejected[0] += 1
+                time.sleep(0.05)
+
+    workers = [threading.Thread(target=batch_worker, daemon=True) for _ in range(batch_workers)]
+    for w in workers:
+        w.start()
+    time.sleep(interval)  # let the batch load build up
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(probes):
+        t0 = time.perf_counter()
+        call(f"interactive {uuid4().hex}", "interactive")
+        latencies.append((time.perf_counter() - t0) * 1000)
+        time.sleep(interval)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for w in workers:
+        w.join()
+
+    ms = sorted(latencies)
+    print(f"{mode:<10} interactive p50={statistics.median(ms):7.1f}ms p95={ms[int(len(ms) * 0.95)]:7.1f}ms "
+          f"max={ms[-1]:7.1f}ms  batch done={batch_done[0]} ({batch_done[0] / elapsed:.1f}/s) rejected={rejected[0]}")
+
+
+def coalescing(url: str, scheduler: LLMScheduler, duplicates: int):
+    before = served(url)
+    prompt = f"same prompt {uuid4().hex}"
+    messages = [{"role": "user", "content": prompt}]
+    threads = [threading.Thread(target=scheduler.run, args=(MODEL, prompt_key(MODEL, messages),
+                                                            lambda: generate(url, prompt)))
+               for _ in range(duplicates)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"coalescing {duplicates} identical prompts -> {served(url) - before} generation(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:11435/api/chat")
+    parser.add_argument("--parallel", type=int, default=2, help="generations the model server runs at once")
+    parser.add_argument("--batch-workers", type=int, default=8)
+    parser.add_argument("--probes", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.2)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--duplicates", type=int, default=10)
+    args = parser.parse_args()
+
+    scheduler = LLMScheduler(max_queue=args.max_queue, concurrency={"default": args.parallel}, interactive_reserved=1)
+    for mode in ("direct", "scheduled"):
+        run(mode, args.url, scheduler, args.batch_workers, args.probes, args.interval)
+    coalescing(args.url, scheduler, args.duplicates)
+
+
+if __name__ == "__main__":
+    main()
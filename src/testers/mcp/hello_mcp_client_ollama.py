@@ -1,5 +1,7 @@
 import asyncio
 import json
+import os
+import sys
 from contextlib import AsyncExitStack
 from pathlib import Path
 from typing import Optional
@@ -8,6 +10,9 @@ import ollama
 from mcp.client.stdio import stdio_client, StdioServerParameters
 from mcp.client.session import ClientSession
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))  # src/
+from model_router import ROUTER, ModelRouterError
+
 class OllamaMCPClient:
     def __init__(self):
         # Initialize session and client objects
@@ -75,10 +80,15 @@ class OllamaMCPClient:
               }}
             }}
             """
-        ollama_response = ollama.chat(
-            model="llama3",
-            messages=[{"role": "user", "content": system_prompt}],
-        )
+        messages = [{"role": "user", "content": system_prompt}]
+        try:
+            ollama_response = await ROUTER.run_async(
+                "tool_selection", messages, lambda model: ollama.chat(model=model, messages=messages),
+                validate=lambda r: self.extract_json(r.message.content)["tool"])
+        except ModelRouterError as e:
+            if e.output is None:
+                raise
+            ollama_response = e.output
         ollama_response_content= ollama_response.message.content
         try:
             tool_call = self.extract_json(ollama_response_content)
@@ -0,0 +1,78 @@
+"""
+Benchmark the streaming chat path against mock_ollama_server.py.
+
+start the mock first:  python mock_ollama_server.py --port 11435 --ttft-ms 200 --tps 50
+then run:              python testers/mock_ollama_bench.py --url http://localhost:11435/api/chat -n 50 -c 8
+"""
+import argparse
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+PROMPT = "Add a color option to api 'blue' "
+
+
+def one_request(url: str, model: str):
+    started = time.perf_counter()
+    first_token = None
+    tokens = 0
+    try:
+        resp = requests.post(url, json={"model": model, "messages": [{"role": "user", "content": PROMPT}]}, stream=True)
+        if resp.status_code != 200:
+            return {"ok": False, "error": f"HTTP {resp.status_code}"}
+        done = False
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            data = json.loads(line.decode("utf-8"))
+            if data.get("done", False):
+                done = True
+                break
+            if data.get("message", {}).get("content"):
+                tokens += 1
+                if first_token is None:
+                    first_token = time.perf_counter()
+        if not done:
+            return {"ok": False, "error": "stream ended without done"}
+    except requests.RequestException as e:
+        return {"ok": False, "error": str(e)}
+    ended = time.perf_counter()
+    return {"ok": True, "ttft": (first_token or ended) - started, "total": ended - started, "tokens": tokens}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:11435/api/chat")
+    parser.add_argument("--model", default="llama3")
+    parser.add_argument("-n", "--requests", type=int, default=20)
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda _: one_request(args.url, args.model), range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if r["ok"]]
+    ttft = [r["ttft"] * 1000 for r in ok]
+    total = [r["total"] * 1000 for r in ok]
+    tokens = sum(r["tokens"] for r in ok)
+    print(f"requests={args.requests} concurrency={args.concurrency} ok={len(ok)} failed={len(results) - len(ok)}")
+    if ok:
+        print(f"ttft  ms: p50={statistics.median(ttft):.1f} p95={percentile(ttft, 95):.1f} max={max(ttft):.1f}")
+        print(f"total ms: p50={statistics.median(total):.1f} p95={percentile(total, 95):.1f} max={max(total):.1f}")
+    print(f"throughput: {len(ok) / elapsed:.2f} req/s, {tokens / elapsed:.1f} tokens/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Round-trip check for app.py's persistence: write, snapshot, write, restart, compare.
+
+run from anywhere:   python testers/persistence_roundtrip.py [--keep DIR]
+
+Each phase runs app.py in its own interpreter (a restart) on the same PROJECT_DATA_DIR:
+  write    builds projects, takes a snapshot, writes more (so recovery needs snapshot + log tail)
+           and saves what /get_project_data returns
+  restart  recovers the store and checks /get_project_data returns exactly the same
+The values include the ones recovery got wrong before: integers outside int64/uint64 (both signs),
+long floats and non-ASCII text. Exits 1 on any difference.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent
+
+AWKWARD_VALUES = [
+    {"username": "big", "age": 123456789012345678901234567890},
+    {"username": "below int64", "age": -9223372036854775809},
+    {"username": "int64 min", "age": -9223372036854775808},
+    {"username": "above uint64", "age": 18446744073709551616},
+    {"username": "zoë ✓", "age": 7, "score": 0.1234567890123456789},
+]
+
+
+def phase_write(state_file: Path):
+    from fastapi.testclient import TestClient
+    from app import app
+
+    sessions = {}
+    with TestClient(app) as client:
+        for p in range(3):
+            project = f"roundtrip_{p}"
+            session_key = client.post("/get_session", json={"project_name": project}).json()["session_key"]
+            sessions[project] = session_key
+            client.post("/set_structure", json={"session_key": session_key, "structure": {
+                "name": "user_profile",
+                "fields": [{"name": "username", "type": "string", "required": True}, {"name": "age", "type": "int"}],
+            }}).raise_for_status()
+            for i, values in enumerate(AWKWARD_VALUES):
+                set_message(client, session_key, f"before_{i}", values)
+
+        resp = client.post("/_snapshot")
+        resp.raise_for_status()
+        print(f"snapshot at seq {resp.json()['snapshot_seq']}")
+
+        for project, session_key in sessions.items():
+            client.post("/set_structure", json={"session_key": session_key, "structure": {
+                "name": "user_profile",
+                "fields": [{"name": "username", "type": "string", "required": True}, {"name": "age", "type": "int"},
+                           {"name": "email", "type": "string"}],
+            }}).raise_for_status()
+            for i, values in enumerate(AWKWARD_VALUES):
+                set_message(client, session_key, f"after_{i}", values)
+            set_message(client, session_key, "before_0", AWKWARD_VALUES[-1])  # overwrite a snapshotted message
+
+        expected = {project: project_data(client, session_key) for project, session_key in sessions.items()}
+    state_file.write_text(json.dumps({"sessions": sessions, "expected": expected}))
+
+
+def phase_restart(state_file: Path) -> bool:
+    from fastapi.testclient import TestClient
+    from app import app
+
+    state = json.loads(state_file.read_text())
+    ok = True
+    with TestClient(app) as client:
+        for project, session_key in state["sessions"].items():
+            got = project_data(client, session_key)
+            if got != state["expected"][project]:
+                ok = False
+                print(f"{project}: recovered data differs")
+                for name, message in state["expected"][project].get("messages", {}).items():
+                    if got.get("messages", {}).get(name) != message:
+                        print(f"    {name}: expected {message}\n    {' ' * len(name)}  got      {got.get('messages', {}).get(name)}")
+    return ok
+
+
+def set_message(client, session_key: str, name: str, values: dict):
+    client.post("/set_message", json={"session_key": session_key, "message": {
+        "name": name, "payload": [{"structure_name": "user_profile", "type": "user_profile", "values": [values]}],
+    }}).raise_for_status()
+
+
+def project_data(client, session_key: str) -> dict:
+    resp = client.get("/get_project_data", params={"session_key": session_key})
+    resp.raise_for_status()
+    return json.loads(resp.content)  # the json module keeps big integers exact
+
+
+def run_phase(phase: str, data_dir: str, state_file: Path) -> int:
+    env = dict(os.environ, PROJECT_DATA_DIR=data_dir)
+    return subprocess.run([sys.executable, __file__, "--phase", phase, "--state", str(state_file)],
+                          cwd=SRC, env=env).returncode
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keep", help="use (and keep) this data dir instead of a temporary one")
+    parser.add_argument("--phase", choices=["write", "restart"], help=argparse.SUPPRESS)
+    parser.add_argument("--state", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        sys.path.insert(0, str(SRC))
+        if args.phase == "write":
+            phase_write(Path(args.state))
+            sys.exit(0)
+        sys.exit(0 if phase_restart(Path(args.state)) else 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.keep or os.path.join(tmp, "data")
+        os.makedirs(data_dir, exist_ok=True)
+        state_file = Path(tmp) / "expected.json"
+        if run_phase("write", data_dir, state_file) != 0:
+            sys.exit("write phase failed")
+        ok = run_phase("restart", data_dir, state_file) == 0
+    print("round trip ok" if ok else "round trip FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
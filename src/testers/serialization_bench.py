@@ -0,0 +1,79 @@
+"""
+Benchmark for app.py request/response encoding: bulk writes and large project reads.
+
+start the app first:  uvicorn app:app --port 8000
+then run:             python testers/serialization_bench.py --messages 2000 --rows 50 --reads 20
+
+Writes --messages messages of --rows rows each (one request per message, like a bulk import),
+then reads the whole project back --reads times with /get_project_data, and reports the
+server-side time per request (client encode/decode is excluded as far as possible by sending
+pre-encoded bodies and not decoding the read responses).
+"""
+import argparse
+import json
+import statistics
+import time
+from uuid import uuid4
+
+import requests
+
+BASE = "http://127.0.0.1:8000"
+
+
+def row(i: int) -> dict:
+    return {"username": f"user{i}", "age": i % 90, "score": i * 0.5, "active": i % 2 == 0,
+            "tags": ["a", "b"], "bio": "lorem ipsum dolor sit amet " * 2}
+
+
+def report(label: str, seconds: list, payload_bytes: int):
+    ms = sorted(s * 1000 for s in seconds)
+    total = sum(seconds)
+    print(f"{label:<18} n={len(ms):<6} p50={statistics.median(ms):8.2f}ms p95={ms[int(len(ms) * 0.95)]:8.2f}ms "
+          f"total={total:7.2f}s  {payload_bytes / total / 1e6:7.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base", default=BASE)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=50, help="rows per message")
+    parser.add_argument("--reads", type=int, default=20)
+    args = parser.parse_args()
+
+    http = requests.Session()
+    session_key = http.post(f"{args.base}/get_session", json={"project_name": f"bench_{uuid4().hex[:6]}"}).json()["session_key"]
+    http.post(f"{args.base}/set_structure", json={"session_key": session_key, "structure": {
+        "name": "user_profile",
+        "fields": [{"name": "username", "type": "string", "required": True}, {"name": "age", "type": "int"},
+                   {"name": "score", "type": "float"}, {"name": "active", "type": "bool"},
+                   {"name": "tags", "type": "list"}, {"name": "bio", "type": "string"}],
+    }}).raise_for_status()
+
+    values = [row(i) for i in range(args.rows)]
+    headers = {"content-type": "application/json"}
+    write_times, written = [], 0
+    for i in range(args.messages):
+        body = json.dumps({"session_key": session_key, "message": {
+            "name": f"m{i}", "payload": [{"structure_name": "user_profile", "type": "user_profile", "values": values}],
+        }}).encode()
+        started = time.perf_counter()
+        resp = http.post(f"{args.base}/set_message", data=body, headers=headers)
+        write_times.append(time.perf_counter() - started)
+        resp.raise_for_status()
+        written += len(body)
+    report("set_message", write_times, written)
+
+    read_times, read = [], 0
+    for _ in range(args.reads):
+        started = time.perf_counter()
+        resp = http.get(f"{args.base}/get_project_data", params={"session_key": session_key})
+        content = resp.content
+        read_times.append(time.perf_counter() - started)
+        resp.raise_for_status()
+        read += len(content)
+    report("get_project_data", read_times, read)
+    print(f"project: {args.messages} messages x {args.rows} rows, response {len(content) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,19 @@
 import json
 import os.path
-from typing import Any
+import re
+import time
+import xml.etree.ElementTree as ET
+from typing import Any, Optional
 
-import requests
 from pathlib import Path
-OLLAMA_URL = "http://localhost:11434/api/chat"
-MODEL = "llama3"  # or whichever model you pulled
+
+import metrics
+from model_router import ROUTER, ModelRouterError
+
+# point at mock_ollama_server.py (e.g. http://localhost:11435/api/chat) for offline runs
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api/chat")
 xml_file="./resources/ApiDemo.xml"
+XML_FENCE_RE = re.compile(r"```(?:xml)?\s*\n(.*?)```", re.S)
 
 
 
@@ -95,14 +102,19 @@ def extract_ollama_content(data: Any) -> str:
         return str(data)
 
 
-def query_ollama(prompt: str):
+def stream_chat(model: str, messages, priority: str = "batch"):
+    import requests  # deferred: the demo reads its XML and prompts before the first model call
+
+    started = time.perf_counter()
     response = requests.post(
         OLLAMA_URL,
         json={
-            "model": MODEL,
-            "messages": [{"role": "user", "content": prompt}],
+            "model": model,
+            "messages": messages,
         },
-        stream=False,
+        # llm_proxy.py (when OLLAMA_URL points at it) queues this behind interactive requests
+        headers={"X-LLM-Priority": priority},
+        stream=True,  # read NDJSON chunks as they arrive instead of buffering the whole body
     )
     if response.status_code != 200:
         # try to include JSON error if available, otherwise raw text
@@ -114,6 +126,7 @@ def query_ollama(prompt: str):
             err_text = response.text.strip()
         raise RuntimeError(f"Ollama returned HTTP {response.status_code}:\n{err_text}")
     full_response=""
+    first_token = None
     for line in response.iter_lines():
         if not line:
             continue
@@ -124,18 +137,113 @@ def query_ollama(prompt: str):
 
         # When done, stop
         if data.get("done", False):
+            metrics.record_tokens(data.get("prompt_eval_count"), data.get("eval_count"))
             break
 
         # Append assistant content (if present)
         message = data.get("message", {})
         content = message.get("content")
         if content:
+            if first_token is None:
+                first_token = time.perf_counter()
+                metrics.observe_stage("llm_time_to_first_token", first_token - started)
             full_response += content
+    metrics.observe_stage("llm_generation", time.perf_counter() - started)
+    return full_response
+
+
+def extract_xml(text: str) -> str:
+    """The XML part of a completion (inside a ``` fence if there is one); raises if it isn't well-formed."""
+    last_error = None
+    for block in XML_FENCE_RE.findall(text) or [text]:
+        start, end = block.find("<"), block.rfind(">")
+        if start == -1 or end < start:
+            continue
+        try:
+            ET.fromstring(block[start:end + 1])
+            return block[start:end + 1]
+        except ET.ParseError as e:
+            last_error = e
+    raise ValueError(f"no well-formed XML in model output ({last_error})")
+
+
+def _xml_error(text: str):
+    try:
+        ET.fromstring(text)
+    except ET.ParseError as e:
+        return e
+    return None
+
+
+START_TAG_RE = re.compile(r"<[A-Za-z_][\w.:-]*(?:\s+[^\s=/>]+\s*=\s*(?:\"[^\"]*\"|'[^']*'))+\s*/?>")
+ATTRIBUTE_RE = re.compile(r"\s+([^\s=/>]+)\s*=\s*(?:\"[^\"]*\"|'[^']*')")
+
+
+def drop_duplicate_attributes(text: str) -> str:
+    """Keep only the first of repeated attributes in every start tag (<Color type="int" type="enum">)."""
+    def fix_tag(match):
+        seen = set()
+
+        def keep_first(attribute):
+            name = attribute.group(1)
+            if name in seen:
+                return ""
+            seen.add(name)
+            return attribute.group(0)
+
+        return ATTRIBUTE_RE.sub(keep_first, match.group(0))
+
+    return START_TAG_RE.sub(fix_tag, text)
+
+
+def xml_validator(reference: str):
+    """
+    validate= for edits of the reference XML: the answer needs one complete block of the reference's
+    root element that parses cleanly. ApiDemo.xml repeats an attribute, and expat stops at the first
+    error, so when the reference only parses without its repeated attributes they are dropped from the
+    answer too before parsing - an edit that faithfully keeps them is still a good answer, but the rest
+    of it is checked.
+    """
+    root = re.search(r"<([A-Za-z_][\w.:-]*)", reference).group(1)
+    block_re = re.compile(rf"<{re.escape(root)}[\s>/].*</{re.escape(root)}\s*>", re.S)
+    repair = _xml_error(reference) is not None and _xml_error(drop_duplicate_attributes(reference)) is None
+
+    def extract(text: str) -> str:
+        last_error = f"no complete <{root}> block"
+        for candidate in XML_FENCE_RE.findall(text) or [text]:
+            match = block_re.search(candidate)
+            if match is None:
+                continue
+            block = match.group(0)
+            error = _xml_error(drop_duplicate_attributes(block) if repair else block)
+            if error is None:
+                return block
+            last_error = str(error)
+        raise ValueError(f"unusable XML in model output ({last_error})")
+
+    return extract
+
+
+def query_ollama(prompt: str, reference_xml: Optional[str] = None, priority: str = "batch"):
+    # a folder of documents is batch work: interactive requests sharing the scheduler go first.
+    # the router picks the model for XML edits and falls back to the next one on unusable XML
+    messages = [{"role": "user", "content": prompt}]
+    validate = xml_validator(reference_xml) if reference_xml else extract_xml
+    try:
+        full_response = ROUTER.run("xml_edit", messages, lambda model: stream_chat(model, messages, priority),
+                                   validate=validate, priority=priority)
+    except ModelRouterError as e:
+        if e.output is None:
+            raise
+        print(f"\n⚠️ no model returned usable XML, keeping the last answer: {e.__cause__}")
+        full_response = e.output
 
     print("\n=== Final Assistant Response ===\n")
     print(full_response)
 
     return full_response
+
+
 def main():
     demo_requests = {
         "Add_Color":"Add a color option to api 'blue' ",
@@ -148,17 +256,22 @@ def main():
     xml_content = Path(xml_file).read_text()
 
     for demo_request in demo_requests.keys():
-        prompt = f"""Here is an API definition in XML:{xml_content}"""
         print(f"processing {demo_request} {demo_requests[demo_request]}")
-        prompt=f"""{prompt} {demo_requests[demo_request]} """
-        prompt=f""" {prompt} Return only the updated well-formed XML. if you have notes
+        with metrics.span("prompt_build"):
+            prompt = f"""Here is an API definition in XML:{xml_content}"""
+            prompt=f"""{prompt} {demo_requests[demo_request]} """
+            prompt=f""" {prompt} Return only the updated well-formed XML. if you have notes
          keep them in xml comments"""
-        output = query_ollama(prompt)
+        output = query_ollama(prompt, xml_content)
         print("\n=== Result ===\n")
         print(output)
 
         with open(os.path.join("..",f"{demo_request}.xml"), "w") as f:
             f.write(output)
 
+    print("\n=== Pipeline metrics ===\n")
+    print(metrics.render())
+    metrics.push()  # to the app's /_metrics when METRICS_PUSH_URL is set
+
 if __name__ == "__main__":
     main()